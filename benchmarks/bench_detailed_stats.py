@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+詳細統計基準測試
+比較舊版（載入範圍內全部Response物件後逐題逐選項遍歷）、分組SQL聚合（json_each展開多選題）
+及時間桶匯總（完整的日/小時加總，首尾不足一小時的部分以分組SQL掃描）的耗時
+
+用法: python benchmarks/bench_detailed_stats.py [回應條數 ...] [--legacy-max N]
+預設規模為 10k、100k、1M 條回應；舊版只在不超過 --legacy-max（預設1M）的規模上運行
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from common import create_app, seed_questions
+from src.models.quiz import db, Question, Response
+from src.services.answer_masks import answer_mask
+from src.services.question_bank import get_question_bank
+from src.services.rollups import rebuild_rollups
+from src.services.session_summaries import backfill_session_summaries
+from src.services.stats import aggregate_question_stats, date_range_filters, raw_question_counts, METRIC_OPTION
+
+BASE_TIME = datetime(2025, 1, 1)
+
+
+def seed_responses(rows, rnd, chunk_size=20000):
+    """按每位用戶回答全部題目生成回應，提交時間均勻分布在一年內"""
+    questions = Question.query.order_by(Question.order).all()
+    sessions = max(1, rows // len(questions))
+    batch = []
+    for n in range(sessions):
+        created_at = BASE_TIME + timedelta(seconds=rnd.randrange(365 * 86400))
+        for q in questions:
+            if q.question_type == 'multiple':
+                answer = sorted(rnd.sample(range(len(q.options)), rnd.randint(0, 4)))
+            else:
+                answer = rnd.randrange(len(q.options))
+            batch.append({
+                'session_id': f'bench-{n}',
+                'question_id': q.id,
+                'answer': answer,
+                'answer_mask': answer_mask(q.question_type, answer),
+                'is_correct': (rnd.random() < 0.5) if q.order <= 17 else None,
+                'created_at': created_at
+            })
+            if len(batch) >= chunk_size:
+                db.session.execute(Response.__table__.insert(), batch)
+                batch = []
+    if batch:
+        db.session.execute(Response.__table__.insert(), batch)
+    db.session.commit()
+    backfill_session_summaries()
+    rebuild_rollups()
+    db.session.commit()
+    return sessions * len(questions)
+
+
+def legacy_stats(start, end):
+    """舊版 get_detailed_stats 的統計部分"""
+    query = Response.query.filter(Response.created_at >= start, Response.created_at <= end)
+    responses = query.all()
+    total_responses = len(set(r.session_id for r in responses))
+
+    result = {}
+    for question in Question.query.order_by(Question.order).all():
+        question_responses = [r for r in responses if r.question_id == question.id]
+        total_answers = len(question_responses)
+        correct_answers = len([r for r in question_responses if r.is_correct]) if question.order <= 17 else 0
+        counts = []
+        if total_answers > 0:
+            for i in range(len(question.options)):
+                if question.question_type == 'single':
+                    counts.append(len([r for r in question_responses if r.answer == i]))
+                else:
+                    counts.append(len([r for r in question_responses if i in (r.answer or [])]))
+        result[question.id] = (total_answers, correct_answers, counts)
+    return total_responses, result
+
+
+def _collect(total_responses, totals, option_counts):
+    result = {}
+    for question in get_question_bank().questions:
+        total_answers, correct_count = totals.get(question.id, (0, 0))
+        correct_answers = correct_count if question.order <= 17 else 0
+        counts = []
+        if total_answers > 0:
+            counts = [option_counts.get(question.id, {}).get(i, 0) for i in range(len(question.options))]
+        result[question.id] = (total_answers, correct_answers, counts)
+    return total_responses, result
+
+
+def sql_stats(start, end):
+    """只用分組SQL掃描範圍內的原始回應"""
+    filters = date_range_filters(start, end)
+    total_responses = db.session.query(func.count(func.distinct(Response.session_id))).filter(*filters).scalar()
+    totals = {}
+    option_counts = {}
+    for (_, metric, question_id, option_index), value in raw_question_counts(filters).items():
+        if metric == METRIC_OPTION:
+            option_counts.setdefault(question_id, {})[option_index] = value
+        else:
+            total, correct = totals.get(question_id, (0, 0))
+            totals[question_id] = (total + value, correct) if metric == 'answers' else (total, correct + value)
+    return _collect(total_responses, totals, option_counts)
+
+
+def rollup_stats(start, end):
+    aggregates = aggregate_question_stats(start, end)
+    return _collect(aggregates.total_responses, aggregates.totals, aggregates.option_counts)
+
+
+def measure(func, start, end):
+    began = time.perf_counter()
+    result = func(start, end)
+    elapsed = time.perf_counter() - began
+    db.session.remove()
+    return elapsed, result
+
+
+def parse_args(argv):
+    sizes = []
+    legacy_max = 1_000_000
+    args = iter(argv)
+    for arg in args:
+        if arg == '--legacy-max':
+            legacy_max = int(next(args))
+        else:
+            sizes.append(int(arg))
+    return sizes or [10_000, 100_000, 1_000_000], legacy_max
+
+
+def main():
+    sizes, legacy_max = parse_args(sys.argv[1:])
+    # 查詢範圍覆蓋全年中的前三個季度，首尾均不在整點
+    start = BASE_TIME + timedelta(days=1, minutes=17)
+    end = BASE_TIME + timedelta(days=273, hours=5, minutes=41)
+
+    print(f'{"回應條數":>10}  {"舊版(s)":>10}  {"分組SQL(s)":>10}  {"時間桶(s)":>10}')
+    for size in sizes:
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            seed_questions()
+            rows = seed_responses(size, random.Random(0))
+            db.session.remove()
+
+            sql_time, sql_result = measure(sql_stats, start, end)
+            rollup_time, rollup_result = measure(rollup_stats, start, end)
+            assert rollup_result == sql_result
+            if size <= legacy_max:
+                legacy_time, legacy_result = measure(legacy_stats, start, end)
+                assert legacy_result == sql_result
+                print(f'{rows:>10}  {legacy_time:>10.3f}  {sql_time:>10.3f}  {rollup_time:>10.4f}')
+            else:
+                print(f'{rows:>10}  {"-":>10}  {sql_time:>10.3f}  {rollup_time:>10.4f}')
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
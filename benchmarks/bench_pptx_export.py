@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+PowerPoint導出基準測試
+比較舊版做法（matplotlib以300dpi繪製PNG，經臨時文件嵌入幻燈片）與python-pptx原生圖表的
+渲染時間、文件大小，以及matplotlib在新進程中的導入耗時
+
+用法: python benchmarks/bench_pptx_export.py [重複次數]
+舊版需要matplotlib，未安裝時只測試原生圖表
+"""
+
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+from common import create_app, seed_questions
+from src.models.quiz import db
+from src.services.question_bank import get_question_bank
+from src.services.report_render import render_powerpoint
+from src.services.reports import QuestionReport, ReportDataset
+from src.services.stats import METRIC_ANSWERS, METRIC_CORRECT, METRIC_OPTION
+
+
+def build_report(rnd, participants=1000):
+    """以倉庫題庫及隨機回答數生成報告數據集，渲染耗時與回應條數無關"""
+    questions = get_question_bank().questions
+    counts = {}
+    for question in questions:
+        total_answers = participants - rnd.randrange(participants // 10)
+        counts[(METRIC_ANSWERS, question.id, 0)] = total_answers
+        counts[(METRIC_CORRECT, question.id, 0)] = rnd.randrange(total_answers + 1)
+        for i in range(len(question.options)):
+            counts[(METRIC_OPTION, question.id, i)] = rnd.randrange(total_answers + 1)
+
+    score_counts = {}
+    for _ in range(participants):
+        score = min(17, max(0, int(rnd.gauss(10, 3))))
+        score_counts[(score, 1)] = score_counts.get((score, 1), 0) + 1
+
+    return ReportDataset(None, None, False, [QuestionReport(q, counts) for q in questions], score_counts)
+
+
+def legacy_render_powerpoint(report, file):
+    """舊版 export_powerpoint 的做法：圖表以matplotlib繪製為PNG後嵌入（seaborn未被使用，已略去）"""
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # 默認字體缺少中文字形，忽略逐字的警告
+    warnings.filterwarnings('ignore', message='Glyph')
+    prs = Presentation()
+    plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'SimHei', 'Arial Unicode MS']
+    plt.rcParams['axes.unicode_minus'] = False
+
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = "攝影問卷系統統計報告"
+    slide.placeholders[1].text = f"統計期間：{report.period}"
+
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "統計總覽"
+    text_frame = slide.shapes.add_textbox(Inches(1), Inches(2), Inches(8), Inches(4)).text_frame
+    text_frame.paragraphs[0].text = f"總回應數：{report.total_responses}"
+    text_frame.paragraphs[0].font.size = Pt(24)
+    for text in (f"問題總數：{report.total_questions}", f"平均分數：{report.average_score(scored_only=False):.1f}"):
+        p = text_frame.add_paragraph()
+        p.text = text
+        p.font.size = Pt(24)
+
+    def add_figure(title):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1)).text_frame.paragraphs[0].text = title
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
+            plt.savefig(tmp_file.name, dpi=300, bbox_inches='tight')
+            chart_path = tmp_file.name
+        plt.close()
+        slide.shapes.add_picture(chart_path, Inches(1), Inches(1.5), Inches(8), Inches(5))
+        os.unlink(chart_path)
+
+    question_numbers = [f"Q{q.order}" for q in report.questions if q.is_technical]
+    correct_rates = [q.correct_rate for q in report.questions if q.is_technical]
+    plt.figure(figsize=(12, 6))
+    bars = plt.bar(question_numbers, correct_rates, color='#4472C4', alpha=0.8)
+    plt.title('各題正確率統計', fontsize=16, fontweight='bold')
+    plt.xlabel('問題編號', fontsize=12)
+    plt.ylabel('正確率 (%)', fontsize=12)
+    plt.ylim(0, 100)
+    for bar, rate in zip(bars, correct_rates):
+        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 1,
+                f'{rate:.1f}%', ha='center', va='bottom', fontsize=10)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    add_figure("各題正確率統計")
+
+    scores = [score for score, count in sorted(report.score_distribution(scored_only=False).items()) for _ in range(count)]
+    plt.figure(figsize=(10, 6))
+    plt.hist(scores, bins=range(0, max(scores)+2), color='#70AD47', alpha=0.8, edgecolor='black')
+    plt.title('分數分布統計', fontsize=16, fontweight='bold')
+    plt.xlabel('正確答題數', fontsize=12)
+    plt.ylabel('人數', fontsize=12)
+    plt.grid(axis='y', alpha=0.3)
+    add_figure("分數分布統計")
+
+    prs.save(file)
+
+
+def measure(render, report, repeat):
+    """返回 (首次耗時, 其後平均耗時, 文件字節數)；首次包含延遲導入的開銷"""
+    timings = []
+    for _ in range(repeat + 1):
+        buffer = io.BytesIO()
+        began = time.perf_counter()
+        render(report, buffer)
+        timings.append(time.perf_counter() - began)
+    warm = timings[1:]
+    return timings[0], sum(warm) / len(warm), len(buffer.getvalue())
+
+
+def matplotlib_import_time():
+    """在新進程中測量 import matplotlib.pyplot 的耗時，未安裝時返回None"""
+    code = 'import time; t = time.perf_counter(); import matplotlib.pyplot; print(time.perf_counter() - t)'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    return float(result.stdout) if result.returncode == 0 else None
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed_questions()
+        report = build_report(random.Random(0))
+
+    try:
+        import matplotlib  # noqa: F401
+        renderers = [('matplotlib PNG', legacy_render_powerpoint)]
+    except ImportError:
+        renderers = []
+    renderers.append(('原生圖表', render_powerpoint))
+
+    print(f'{"做法":<16}  {"首次(s)":>10}  {"平均(s)":>10}  {"文件(KB)":>10}')
+    for name, render in renderers:
+        first, average, size = measure(render, report, repeat)
+        print(f'{name:<16}  {first:>10.3f}  {average:>10.3f}  {size / 1024:>10.1f}')
+
+    import_time = matplotlib_import_time()
+    if import_time is not None:
+        print(f'\nimport matplotlib.pyplot（新進程）: {import_time:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
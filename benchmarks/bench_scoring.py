@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+評分引擎微基準測試
+比較舊版（逐題查詢數據庫、評分兩次及另一次遍歷提取興趣）與編譯評分計劃（單次遍歷）的每次提交CPU時間
+
+用法: python benchmarks/bench_scoring.py [提交次數]
+"""
+
+import random
+import sys
+import time
+
+from common import create_app, seed_questions
+from src.models.quiz import db, Question
+from src.services.question_bank import get_question_bank
+
+
+def random_answers(rnd, questions):
+    answers = []
+    for q in questions:
+        if q.question_type == 'multiple':
+            answer = sorted(rnd.sample(range(len(q.options)), rnd.randint(0, 4)))
+        else:
+            answer = rnd.randrange(len(q.options))
+        answers.append({'question_id': q.id, 'answer': answer})
+    return answers
+
+
+def legacy_submit(answers):
+    """舊版流程：submit_quiz評分一次，commit後get_recommended_courses再評分一次並再遍歷一次提取興趣"""
+    total_score = 0
+    for answer in answers:
+        question = Question.query.get(answer['question_id'])
+        if question.order <= 17:
+            if question.question_type == 'single':
+                is_correct = answer['answer'] == question.correct_answer
+            else:
+                is_correct = set(answer['answer']) == set(question.correct_answer)
+            if is_correct:
+                total_score += 1
+    db.session.commit()
+
+    recommend_score = 0
+    for answer in answers:
+        question = Question.query.get(answer['question_id'])
+        if not question or question.order > 17:
+            continue
+        if question.question_type == 'single':
+            is_correct = answer['answer'] == question.correct_answer
+        else:
+            is_correct = set(answer['answer']) == set(question.correct_answer)
+        if is_correct:
+            recommend_score += 1
+
+    selected_interests = []
+    for answer in answers:
+        question = Question.query.get(answer['question_id'])
+        if not question or question.order != 18:
+            continue
+        for option_index in answer.get('answer', []):
+            if 0 <= option_index < len(question.options):
+                selected_interests.append(question.options[option_index])
+    return total_score, selected_interests
+
+
+def compiled_submit(answers):
+    result = get_question_bank().scoring_plan.score(answers)
+    return result.score, result.interests
+
+
+def measure(func, submissions):
+    start = time.process_time()
+    for answers in submissions:
+        func(answers)
+        # 每次提交對應一個新的請求會話
+        db.session.remove()
+    return (time.process_time() - start) / len(submissions)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed_questions()
+        questions = Question.query.order_by(Question.order).all()
+        rnd = random.Random(0)
+        submissions = [random_answers(rnd, questions) for _ in range(count)]
+        db.session.remove()
+
+        for answers in submissions[:50]:
+            assert legacy_submit(answers) == compiled_submit(answers)
+            db.session.remove()
+
+        legacy = measure(legacy_submit, submissions)
+        compiled = measure(compiled_submit, submissions)
+
+    print(f'提交次數: {count}（每次 {len(questions)} 題）')
+    print(f'舊版（逐題查詢，三次遍歷）: {legacy * 1e6:10.1f} µs/次')
+    print(f'編譯評分計劃（單次遍歷）:   {compiled * 1e6:10.1f} µs/次')
+    print(f'加速: {legacy / compiled:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""基準測試共用工具：建立獨立的Flask應用並從倉庫內的app.db複製題庫"""
+
+import json
+import os
+import sqlite3
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from flask import Flask
+from src.models.quiz import db, Question
+
+APP_DB = os.path.join(ROOT_DIR, 'src', 'database', 'app.db')
+
+
+def create_app(database_uri='sqlite://'):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def _json_value(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def seed_questions():
+    """從倉庫內的app.db複製題庫（唯讀打開，不會修改原數據庫）"""
+    conn = sqlite3.connect(f'file:{APP_DB}?mode=ro', uri=True)
+    rows = conn.execute('SELECT id, content, question_type, "order", options, correct_answer FROM question').fetchall()
+    conn.close()
+    for row in rows:
+        db.session.add(Question(
+            id=row[0], content=row[1], question_type=row[2], order=row[3],
+            options=_json_value(row[4]), correct_answer=_json_value(row[5])
+        ))
+    db.session.commit()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+回填提交匯總：為尚未有匯總的舊提交按現有回應補寫分數、等級及興趣
+可重複執行，已有匯總的提交不會重複寫入
+只連接與 main.py 相同的數據庫，不載入服務（不執行遷移、不啟動導出進程池、不重放提交日誌），
+可在服務運行時執行；運行中服務的統計結果緩存在下次提交後更新
+"""
+
+import sys
+import os
+
+# 添加項目根目錄到Python路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from flask import Flask
+from src.models.quiz import db
+from src.services.session_summaries import backfill_session_summaries
+from src.services.rollups import rebuild_rollups
+
+def create_app():
+    """只配置數據庫的應用（數據庫路徑與 main.py 相同）"""
+    app = Flask(__name__)
+    db_path = os.path.join(current_dir, 'database', 'app.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def backfill():
+    """回填提交匯總"""
+    app = create_app()
+    with app.app_context():
+        try:
+            count = backfill_session_summaries()
+            if count:
+                # 分數分布的時間桶匯總取自提交匯總，補寫後需要重建
+                rebuild_rollups()
+            db.session.commit()
+
+            if count:
+                print(f"✅ 已回填 {count} 筆提交匯總")
+            else:
+                print("ℹ️  所有提交均已有匯總")
+
+        except Exception as e:
+            print(f"❌ 回填提交匯總失敗: {str(e)}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    backfill()
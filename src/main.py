@@ -3,9 +3,18 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from src.models.quiz import db
 from src.routes.quiz import quiz_bp
+from src.services.schema_migrations import run_migrations
+from src.services.ingest import init_submission_ingest
+from src.services.export_jobs import init_export_jobs
+from src.services.stats_counters import ensure_counters
+from src.services.session_summaries import ensure_session_summaries
+from src.services.rollups import ensure_rollups
+from src.services.http_cache import make_cached_response
+from src.services.static_assets import StaticAssetTable
+from src.services.process_guard import acquire_process_lock, owns_process_lock
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'photography-quiz-secret-key-2024'
@@ -18,15 +27,44 @@ db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', '
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# 寫後提交模式：提交先寫入本地日誌，由後台線程批量寫入數據庫（SUBMIT_WRITE_BEHIND=1 啟用）
+app.config['SUBMIT_WRITE_BEHIND'] = os.environ.get('SUBMIT_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+app.config['SUBMIT_BATCH_ROWS'] = int(os.environ.get('SUBMIT_BATCH_ROWS', 100))
+app.config['SUBMIT_FLUSH_INTERVAL'] = float(os.environ.get('SUBMIT_FLUSH_INTERVAL', 0.2))
+# 批次寫入失敗的重試次數（指數退避），之後逐筆寫入並將無法寫入的提交移入死信文件
+app.config['SUBMIT_MAX_RETRIES'] = int(os.environ.get('SUBMIT_MAX_RETRIES', 5))
+journal_path = os.path.join(os.path.dirname(db_path), 'submit_journal.log')
+
+# 後台報告導出：渲染進程數、完成後文件保留秒數、未完成任務上限及保留的已完成任務上限
+app.config['EXPORT_WORKERS'] = int(os.environ.get('EXPORT_WORKERS', 2))
+app.config['EXPORT_TTL'] = int(os.environ.get('EXPORT_TTL', 3600))
+app.config['EXPORT_MAX_PENDING'] = int(os.environ.get('EXPORT_MAX_PENDING', 16))
+app.config['EXPORT_MAX_FINISHED'] = int(os.environ.get('EXPORT_MAX_FINISHED', 100))
+export_dir = os.path.join(os.path.dirname(db_path), 'exports')
+
 # 確保數據庫目錄存在
 db_dir = os.path.dirname(db_path)
 if not os.path.exists(db_dir):
     os.makedirs(db_dir)
 
+# 緩存、寫後日誌及導出任務都只屬於一個進程：同一數據庫只允許一個應用進程（gunicorn須使用單一worker）
+acquire_process_lock(db_path + '.lock')
+
+
+@app.before_request
+def require_single_process():
+    # gunicorn --preload 時由主進程取得鎖，後台線程不會帶到fork出的worker，拒絕服務
+    if not owns_process_lock():
+        return "應用須以單進程方式部署（不支援 gunicorn --preload，見Procfile）", 500
+
+
 db.init_app(app)
 with app.app_context():
     db.create_all()
     
+    # 為已部署的數據庫補上create_all不會建立的索引等結構變更
+    run_migrations()
+    
     # 初始化默認推薦設定
     from src.models.quiz import RecommendationSettings
     try:
@@ -53,34 +91,38 @@ with app.app_context():
         print(f"⚠️ 初始化推薦設定時出現問題: {str(e)}")
         db.session.rollback()
 
+# 統計計數表、提交匯總表及時間桶匯總尚未初始化時按現有回應回填
+with app.app_context():
+    ensure_counters()
+    ensure_session_summaries()
+    ensure_rollups()
+
+# 啟動導出進程池（在後台寫入線程啟動之前fork工作進程）
+init_export_jobs(app, export_dir)
+
+# 重放上次未寫入數據庫的提交，並按設定啟動後台寫入線程
+init_submission_ingest(app, journal_path, app.config['SUBMIT_WRITE_BEHIND'])
+
+# 靜態頁面在啟動時載入內存並預先壓縮
+static_assets = StaticAssetTable(app.static_folder)
+
 # 公開版本路由 - 只有問卷功能
 @app.route('/public')
 def public_quiz():
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-    
-    public_path = os.path.join(static_folder_path, 'public.html')
-    if os.path.exists(public_path):
-        return send_from_directory(static_folder_path, 'public.html')
-    else:
+    asset = static_assets.get('public.html')
+    if asset is None:
         return "public.html not found", 404
+    return make_cached_response(asset, 'no-cache')
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    asset = static_assets.get(path) if path != "" else None
+    if asset is None:
+        asset = static_assets.get('index.html')
+        if asset is None:
             return "index.html not found", 404
+    return make_cached_response(asset, 'no-cache')
 
 
 if __name__ == '__main__':
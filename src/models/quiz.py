@@ -35,13 +35,55 @@ class ScoreSettings(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Response(db.Model):
+    # created_at在前的複合索引同時支持日期範圍篩選及範圍內按題目分組
+    __table_args__ = (
+        db.Index('ix_response_created_at_question_id', 'created_at', 'question_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    session_id = db.Column(db.String(100), nullable=False)
-    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    session_id = db.Column(db.String(100), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False, index=True)
     answer = db.Column(db.JSON, nullable=False)  # 存儲用戶答案
+    answer_mask = db.Column(db.Integer, nullable=True)  # 按題型編碼的選項位掩碼，無法編碼時為NULL
     is_correct = db.Column(db.Boolean, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class SessionSummary(db.Model):
+    """每次提交的匯總（提交時寫入一次），統計人數、平均分及分數分布時無需掃描全部回應"""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(100), unique=True, nullable=False)
+    score = db.Column(db.Integer, nullable=False, default=0)  # 答對的評分題數
+    max_score = db.Column(db.Integer, nullable=False, default=0)  # 作答的評分題數
+    level = db.Column(db.String(50), nullable=True)  # 提交時的等級
+    interests = db.Column(db.JSON, nullable=True)  # 第18題所選的興趣選項文字
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class StatsRollup(db.Model):
+    """按小時及按日預先匯總的統計（提交時增量更新），日期範圍查詢只需加總完整的時間桶"""
+    granularity = db.Column(db.String(10), primary_key=True)  # hour, day
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)  # score, answers, correct, option
+    key1 = db.Column(db.Integer, primary_key=True)  # 分數或題目ID
+    key2 = db.Column(db.Integer, primary_key=True)  # 是否有評分題回答或選項索引，不適用時為0
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class QuestionCounter(db.Model):
+    """每題回答總數及答對數（提交時增量更新）"""
+    question_id = db.Column(db.Integer, primary_key=True)
+    total_answers = db.Column(db.Integer, nullable=False, default=0)
+    correct_answers = db.Column(db.Integer, nullable=False, default=0)
+
+class OptionCounter(db.Model):
+    """每題每個選項的選擇人數（提交時增量更新）"""
+    question_id = db.Column(db.Integer, primary_key=True)
+    option_index = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class StatsCounter(db.Model):
+    """其他全局計數（如總回應人數）"""
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
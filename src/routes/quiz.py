@@ -1,23 +1,45 @@
-from flask import Blueprint, request, jsonify, session, send_file
+from flask import Blueprint, request, jsonify, session, send_file, current_app, stream_with_context
 from datetime import datetime
-from ..models.quiz import Question, Response, Course, Admin, ScoreSettings, RecommendationSettings, db
+from ..models.quiz import Question, Response, SessionSummary, Course, Admin, ScoreSettings, RecommendationSettings, db
+from ..services.question_bank import get_question_bank, invalidate_question_bank
+from ..services.http_cache import make_cached_response
+from ..services.answer_masks import refresh_answer_masks
+from ..services.stats import count_sessions, date_range_filters, floor_day, session_score_counts
+from ..services.rollups import clear_rollups, rebuild_rollups
+from ..services.stats_counters import (
+    apply_responses, clear_counters, delete_question_counters, read_counters, rebuild_counters, refresh_session_count
+)
+from ..services.submissions import build_submission, commit_submissions
+from ..services.session_summaries import resync_session_summaries, session_days
+from ..services.reports import get_report_dataset
+from ..services.scoring import SCORED_MAX_ORDER
+from ..services.report_render import EXPORT_FORMATS, render_excel, render_powerpoint
+from ..services.export_jobs import STATUS_DONE, get_export_jobs
+from ..services.raw_export import RAW_EXPORT_FORMATS, ROWS_PER_RESPONSE, ROWS_PER_SESSION, gzip_chunks, iter_raw_export
+from ..services.stats_cache import bump_data_version, cached_stats, stats_cache_stats
+from ..services.stats_stream import publish_reset, stream_events
+from ..services.ingest import get_submission_writer
+from ..services.course_catalog import get_course_catalog, invalidate_course_catalog
+from ..services.level_table import UNMATCHED, get_level_table, invalidate_level_table
+from ..services.recommendation_settings import (
+    DEFAULT_RECOMMENDATION_SETTING, get_active_recommendation_snapshot, invalidate_active_recommendation_setting
+)
+from ..services.recommendation_cache import (
+    recommendation_cache_key, get_cached_recommendations, store_recommendations,
+    invalidate_recommendations, recommendation_cache_stats
+)
 import json
 from werkzeug.security import check_password_hash
 from sqlalchemy import func
 import uuid
+from urllib.parse import quote
 
 quiz_bp = Blueprint('quiz', __name__)
 
 @quiz_bp.route('/api/questions', methods=['GET'])
 def get_questions():
-    questions = Question.query.order_by(Question.order).all()
-    return jsonify([{
-        'id': q.id,
-        'content': q.content,
-        'question_type': q.question_type,
-        'order': q.order,
-        'options': q.options
-    } for q in questions])
+    # 題庫變更前一直使用同一份預先序列化的內容，瀏覽器以ETag重新驗證
+    return make_cached_response(get_question_bank().public_payload(), 'no-cache')
 
 @quiz_bp.route('/api/submit', methods=['POST'])
 def submit_quiz():
@@ -28,40 +50,15 @@ def submit_quiz():
             
         session_id = str(uuid.uuid4())
         
-        total_score = 0
-        max_score = 0
+        # 單次遍歷完成評分、對錯判斷及興趣提取
+        result = get_question_bank().scoring_plan.score(data['answers'])
+        total_score = result.score
+        max_score = result.max_score
         
-        for answer in data['answers']:
-            if not answer or 'question_id' not in answer or 'answer' not in answer:
-                continue
-                
-            question = Question.query.get(answer['question_id'])
-            if not question:
-                continue
-                
-            # 只對技術問題計分（前17題）
-            if question.order <= 17:
-                max_score += 1
-                is_correct = False
-                
-                if question.question_type == 'single':
-                    is_correct = answer['answer'] == question.correct_answer
-                elif question.question_type == 'multiple':
-                    is_correct = set(answer['answer']) == set(question.correct_answer)
-                
-                if is_correct:
-                    total_score += 1
-            else:
-                is_correct = None  # 非評分題目
-            
-            # 保存回應
-            response = Response(
-                session_id=session_id,
-                question_id=question.id,
-                answer=answer['answer'],
-                is_correct=is_correct
-            )
-            db.session.add(response)
+        # 使用評分設定計算等級及顯示顏色（一次查詢等級表），等級與回應一同記錄在提交匯總中
+        level, level_color = get_user_level_and_color(total_score)
+        
+        submission = build_submission(session_id, result, level)
         
         # 處理"其它"選項的文字輸入
         other_inputs = data.get('other_inputs', {})
@@ -71,27 +68,18 @@ def submit_quiz():
             print(f"用戶自定義輸入: {other_inputs}")
             # 可以考慮將這些數據保存到一個專門的表中，或者作為JSON存儲在Response表的額外字段中
         
-        db.session.commit()
+        # 保存回應：寫後模式下寫入日誌後立即返回，由後台線程批量寫入數據庫
+        writer = get_submission_writer()
+        if writer:
+            writer.submit(submission)
+        else:
+            commit_submissions([submission])
         
         # 計算百分比
-        percentage = (total_score / max_score * 100) if max_score > 0 else 0
-        
-        # 使用評分設定計算等級
-        user_level = get_user_level_by_score(total_score)
-        
-        # 設定等級顏色
-        level_colors = {
-            '攝影新手': '#4CAF50',
-            '進階攝影師': '#FF9800', 
-            '高階攝影師': '#F44336',
-            '中階攝影師': '#FF9800'  # 向後兼容
-        }
-        
-        level = user_level
-        level_color = level_colors.get(user_level, '#6c757d')  # 默認灰色
+        percentage = result.percentage
         
         # 獲取推薦課程
-        recommended_courses = get_recommended_courses(data['answers'])
+        recommended_courses = get_recommended_courses(total_score, result.interests)
         
         return jsonify({
             'session_id': session_id,
@@ -114,146 +102,98 @@ def submit_quiz():
         
         return jsonify({'error': '服務器內部錯誤，請稍後重試'}), 500
 
-def get_recommended_courses(answers):
+def get_recommended_courses(total_score, selected_interests):
     """
     根據分數和興趣智能推薦課程，從數據庫動態讀取課程信息
     只推薦開啟的課程，並基於興趣關聯進行精確配對
+    分數及第18題的興趣選擇由評分計劃在提交時一次計算後傳入
+    推薦結果只取決於等級及興趣集合，按兩者緩存
     """
+    # 先取緩存鍵，再讀取課程目錄及設定
+    user_level = get_user_level_by_score(total_score)
+    cache_key = recommendation_cache_key(user_level, selected_interests)
+    
+    cached_courses = get_cached_recommendations(cache_key)
+    if cached_courses is not None:
+        return cached_courses
+    
     try:
-        # 計算分數
-        total_score = 0
-        max_score = 17  # 前17題為技術問題
-        
-        for answer in answers:
-            if not answer or 'question_id' not in answer:
-                continue
-                
-            question = Question.query.get(answer['question_id'])
-            if not question or question.order > 17:
-                continue
-                
-            is_correct = False
-            if question.question_type == 'single':
-                is_correct = answer['answer'] == question.correct_answer
-            elif question.question_type == 'multiple':
-                is_correct = set(answer['answer']) == set(question.correct_answer)
-            
-            if is_correct:
-                total_score += 1
-        
-        # 分析第18題的興趣選擇
-        selected_interests = []
-        for answer in answers:
-            if not answer or 'question_id' not in answer:
-                continue
-                
-            question = Question.query.get(answer['question_id'])
-            if not question or question.order != 18:
-                continue
-                
-            # 獲取第18題的選項
-            selected_options = answer.get('answer', [])
-            if isinstance(selected_options, list):
-                for option_index in selected_options:
-                    if 0 <= option_index < len(question.options):
-                        option_text = question.options[option_index]
-                        selected_interests.append(option_text)
-        
-        # 從數據庫獲取所有開啟的課程
-        all_courses = Course.query.filter_by(is_active=True).all()
-        
-        if not all_courses:
-            return get_fallback_courses(total_score, selected_interests)
-        
-        # 將課程轉換為推薦格式
-        def course_to_dict(course, priority=1):
-            return {
-                'title': course.title,
-                'category': course.category,
-                'description': course.description,
-                'level': course.level,
-                'priority': priority
-            }
-        
-        # 開始構建推薦課程列表
-        recommended_courses = []
-        used_course_ids = set()
-        
-        # 1. 根據評分設定判斷用戶等級並推薦相應課程
-        user_level = get_user_level_by_score(total_score)
-        
-        # 如果是攝影新手，必須推薦指定的4個課程
-        if user_level == '攝影新手':
-            beginner_required_titles = [
-                'EOS R系列相機全面操作班',
-                '基本自動對焦 - 理論班',
-                '掌握拍攝設定-拍出準確色彩不求人',
-                '鏡頭配搭實用指南'
-            ]
-            
-            priority = 1
-            for required_title in beginner_required_titles:
-                for course in all_courses:
-                    if course.id not in used_course_ids and required_title in course.title:
-                        recommended_courses.append(course_to_dict(course, priority))
-                        used_course_ids.add(course.id)
-                        priority += 1
-                        break
-        
-        # 2. 基於興趣關聯的智能配對
-        for interest in selected_interests:
+        recommended_courses = build_recommended_courses(total_score, user_level, selected_interests)
+    except Exception as e:
+        print(f"課程推薦錯誤: {e}")
+        return get_fallback_courses(total_score, selected_interests)
+    
+    store_recommendations(cache_key, recommended_courses)
+    return recommended_courses
+
+def build_recommended_courses(total_score, user_level, selected_interests):
+    """按等級及興趣構建推薦課程列表，出錯時由調用方回退到備用推薦"""
+    # 開啟課程目錄快照（含興趣標籤倒排索引）
+    catalog = get_course_catalog()
+    all_courses = catalog.courses
+    
+    if not all_courses:
+        return get_fallback_courses(total_score, selected_interests)
+    
+    # 開始構建推薦課程列表
+    recommended_courses = []
+    used_course_ids = set()
+    
+    # 1. 根據評分設定判斷的用戶等級推薦相應課程
+    # 如果是攝影新手，必須推薦指定的4個課程
+    if user_level == '攝影新手':
+        beginner_required_titles = [
+            'EOS R系列相機全面操作班',
+            '基本自動對焦 - 理論班',
+            '掌握拍攝設定-拍出準確色彩不求人',
+            '鏡頭配搭實用指南'
+        ]
+        
+        priority = 1
+        for required_title in beginner_required_titles:
             for course in all_courses:
-                if course.id in used_course_ids:
-                    continue
-                
-                # 檢查課程的興趣標籤是否匹配
-                course_tags = []
-                if hasattr(course, 'interest_tags') and course.interest_tags:
-                    if isinstance(course.interest_tags, list):
-                        course_tags = course.interest_tags
-                    else:
-                        try:
-                            course_tags = json.loads(course.interest_tags)
-                        except:
-                            course_tags = []
-                
-                # 如果課程的興趣標籤包含用戶選擇的興趣
-                if interest in course_tags:
-                    priority = len(recommended_courses) + 1
-                    recommended_courses.append(course_to_dict(course, priority))
+                if course.id not in used_course_ids and required_title in course.title:
+                    recommended_courses.append(course.to_dict(priority))
                     used_course_ids.add(course.id)
-                    
-                    # 限制每個興趣最多推薦4個課程
-                    interest_count = sum(1 for c in recommended_courses if interest in course_tags)
-                    if interest_count >= 4:
-                        break
-        
-        # 3. 如果推薦課程不足，補充其他開啟的課程
-        # 獲取推薦設定
-        recommendation_setting = get_active_recommendation_setting()
-        min_courses = recommendation_setting['min_courses']
-        max_courses = recommendation_setting['max_courses']
-        
-        if len(recommended_courses) < min_courses:
-            remaining_courses = [c for c in all_courses if c.id not in used_course_ids]
-            needed = min(max_courses - len(recommended_courses), len(remaining_courses))
+                    priority += 1
+                    break
+    
+    # 2. 基於興趣關聯的智能配對（通過倒排索引直接取得標籤匹配的課程）
+    for interest in selected_interests:
+        for course in catalog.courses_for_interest(interest):
+            if course.id in used_course_ids:
+                continue
             
-            for course in remaining_courses[:needed]:
-                priority = len(recommended_courses) + 1
-                recommended_courses.append(course_to_dict(course, priority))
-                used_course_ids.add(course.id)
-        
-        # 4. 限制推薦數量根據設定
-        recommended_courses = recommended_courses[:max_courses]
-        
-        # 5. 按優先級排序
-        recommended_courses.sort(key=lambda x: x['priority'])
-        
-        return recommended_courses
+            priority = len(recommended_courses) + 1
+            recommended_courses.append(course.to_dict(priority))
+            used_course_ids.add(course.id)
+            
+            # 已推薦課程達到4個時，不再為此興趣繼續配對
+            if len(recommended_courses) >= 4:
+                break
+    
+    # 3. 如果推薦課程不足，補充其他開啟的課程
+    # 獲取推薦設定
+    recommendation_setting = get_active_recommendation_setting()
+    min_courses = recommendation_setting['min_courses']
+    max_courses = recommendation_setting['max_courses']
+    
+    if len(recommended_courses) < min_courses:
+        remaining_courses = [c for c in all_courses if c.id not in used_course_ids]
+        needed = min(max_courses - len(recommended_courses), len(remaining_courses))
         
-    except Exception as e:
-        print(f"課程推薦錯誤: {e}")
-        return get_fallback_courses(total_score, selected_interests)
+        for course in remaining_courses[:needed]:
+            priority = len(recommended_courses) + 1
+            recommended_courses.append(course.to_dict(priority))
+            used_course_ids.add(course.id)
+    
+    # 4. 限制推薦數量根據設定
+    recommended_courses = recommended_courses[:max_courses]
+    
+    # 5. 按優先級排序
+    recommended_courses.sort(key=lambda x: x['priority'])
+    
+    return recommended_courses
 
 def get_fallback_courses(total_score, selected_interests):
     """
@@ -385,24 +325,22 @@ def get_admin_stats():
     if not session.get('admin_logged_in'):
         return jsonify({'error': '未登錄'}), 401
     
-    total_responses = db.session.query(Response.session_id).distinct().count()
+    return jsonify(cached_stats('admin_stats', (), compute_admin_stats))
+
+def compute_admin_stats():
+    total_responses = count_sessions()
     total_questions = Question.query.count()
     
-    # 計算平均分數
-    scores = db.session.query(
-        Response.session_id,
-        func.sum(Response.is_correct.cast(db.Integer)).label('score')
-    ).filter(
-        Response.is_correct.isnot(None)
-    ).group_by(Response.session_id).all()
-    
-    avg_score = sum(score.score for score in scores) / len(scores) if scores else 0
+    # 計算平均分數（只計有評分題回答的用戶）
+    score_counts = session_score_counts()
+    scored_sessions = sum(score_counts.values())
+    avg_score = sum(score * count for score, count in score_counts.items()) / scored_sessions if scored_sessions else 0
     
-    return jsonify({
+    return {
         'total_responses': total_responses,
         'total_questions': total_questions,
         'avg_score': round(avg_score, 1)
-    })
+    }
 
 @quiz_bp.route('/api/admin/real_time_stats', methods=['GET'])
 def get_real_time_stats():
@@ -410,22 +348,21 @@ def get_real_time_stats():
     if not session.get('admin_logged_in'):
         return jsonify({'error': '未登錄'}), 401
     
-    # 獲取所有回應數據
-    responses = Response.query.all()
-    
-    # 總回應數
-    total_responses = len(set(r.session_id for r in responses))
+    return jsonify(cached_stats('real_time_stats', (), compute_real_time_stats))
+
+def compute_real_time_stats():
+    # 讀取提交時增量維護的計數，不再掃描全部回應
+    total_responses, question_counters, option_counters = read_counters()
     
     # 問題統計
-    questions = Question.query.order_by(Question.order).all()
+    questions = get_question_bank().questions
     question_stats = []
     
     for question in questions:
-        question_responses = [r for r in responses if r.question_id == question.id]
-        total_answers = len(question_responses)
+        total_answers, correct_count = question_counters.get(question.id, (0, 0))
         
-        if question.order <= 17:  # 技術問題
-            correct_answers = len([r for r in question_responses if r.is_correct])
+        if question.order <= SCORED_MAX_ORDER:  # 技術問題
+            correct_answers = correct_count
             correct_rate = (correct_answers / total_answers * 100) if total_answers > 0 else 0
         else:
             correct_answers = 0
@@ -435,11 +372,7 @@ def get_real_time_stats():
         option_stats = []
         if total_answers > 0:
             for i, option in enumerate(question.options):
-                if question.question_type == 'single':
-                    count = len([r for r in question_responses if r.answer == i])
-                else:  # multiple choice
-                    count = len([r for r in question_responses if i in (r.answer or [])])
-                
+                count = option_counters.get((question.id, i), 0)
                 percentage = (count / total_answers * 100) if total_answers > 0 else 0
                 option_stats.append({
                     'option': option,
@@ -458,107 +391,116 @@ def get_real_time_stats():
             'option_stats': option_stats
         })
     
-    return jsonify({
+    return {
         'total_responses': total_responses,
         'question_stats': question_stats
-    })
+    }
+
+
+@quiz_bp.route('/api/admin/stats/stream', methods=['GET'])
+def stream_real_time_stats():
+    """即時統計的SSE推送：先發送快照或補發遺漏的增量，之後在每次提交寫入後推送增量"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    # 瀏覽器自動重連時帶 Last-Event-ID，手動重連時可用 cursor 參數
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    return current_app.response_class(
+        stream_with_context(stream_events(cursor)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 @quiz_bp.route('/api/admin/detailed_stats', methods=['GET'])
 def get_detailed_stats():
+    """
+    日期範圍內的詳細統計
+    人數及分數分布按提交時間（SessionSummary.created_at）篩選，每次提交只計入一次，分數按整次提交計算；
+    每題回答數及選項計數按各回應的時間篩選
+    與舊版（按範圍內回應的不同session_id計數）的差異只出現在回應跨越範圍邊界的提交：
+    按回應回填的舊提交以最早的回應時間作為提交時間，只在該時間所在的範圍內計入；
+    新提交的所有回應與匯總使用同一時間，兩種計法結果相同
+    """
     if not session.get('admin_logged_in'):
         return jsonify({'error': '未登錄'}), 401
     
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    # 基礎查詢
-    query = Response.query
+    start = datetime.fromisoformat(start_date) if start_date else None
+    end = datetime.fromisoformat(end_date) if end_date else None
+    # approx=true時只讀日桶匯總，返回估計值及上下界；預設為精確統計
+    approx = request.args.get('approx') == 'true'
     
-    # 日期篩選
-    if start_date:
-        query = query.filter(Response.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Response.created_at <= datetime.fromisoformat(end_date))
-    
-    responses = query.all()
-    
-    # 總回應數
-    total_responses = len(set(r.session_id for r in responses))
+    return jsonify(compute_detailed_stats(start, end, approx))
+
+def compute_detailed_stats(start, end, approx=False):
+    # 由報告數據集生成（與導出共用，按日期範圍及數據版本緩存）
+    dataset = get_report_dataset(start, end, approx)
     
     # 問題統計
-    questions = Question.query.order_by(Question.order).all()
     question_stats = []
     
-    for question in questions:
-        question_responses = [r for r in responses if r.question_id == question.id]
-        total_answers = len(question_responses)
-        
-        if question.order <= 17:  # 技術問題
-            correct_answers = len([r for r in question_responses if r.is_correct])
-            correct_rate = (correct_answers / total_answers * 100) if total_answers > 0 else 0
-        else:
-            correct_answers = 0
-            correct_rate = 0
+    for question in dataset.questions:
+        total_answers = question.total_answers
         
         # 選項統計
         option_stats = []
         if total_answers > 0:
             for i, option in enumerate(question.options):
-                if question.question_type == 'single':
-                    count = len([r for r in question_responses if r.answer == i])
-                else:  # multiple choice
-                    count = len([r for r in question_responses if i in (r.answer or [])])
-                
-                percentage = (count / total_answers * 100) if total_answers > 0 else 0
-                option_stats.append({
+                option_stat = {
                     'option': option,
-                    'count': count,
-                    'percentage': round(percentage, 1)
-                })
-        
-        question_stats.append({
+                    'count': question.option_counts[i],
+                    'percentage': round(question.option_percentage(i), 1)
+                }
+                if approx:
+                    option_stat['count_bounds'] = question.option_bounds[i]
+                option_stats.append(option_stat)
+        
+        question_stat = {
             'id': question.id,
             'order': question.order,
             'content': question.content,
             'question_type': question.question_type,
-            'correct_rate': round(correct_rate, 1),
-            'correct_answers': correct_answers,
+            'correct_rate': round(question.correct_rate, 1),
+            'correct_answers': question.correct_answers,
             'total_answers': total_answers,
             'option_stats': option_stats
-        })
+        }
+        if approx:
+            question_stat['total_answers_bounds'] = question.total_answers_bounds
+            question_stat['correct_answers_bounds'] = question.correct_answers_bounds
+        question_stats.append(question_stat)
     
-    # 分數分布統計
+    # 分數分布統計（只計有評分題回答的用戶）
     score_distribution = []
-    session_scores = db.session.query(
-        Response.session_id,
-        func.sum(Response.is_correct.cast(db.Integer)).label('score')
-    ).filter(
-        Response.is_correct.isnot(None)
-    ).group_by(Response.session_id)
-    
-    if start_date or end_date:
-        if start_date:
-            session_scores = session_scores.filter(Response.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            session_scores = session_scores.filter(Response.created_at <= datetime.fromisoformat(end_date))
-    
-    scores = [s.score for s in session_scores.all()]
-    
-    for score in range(18):  # 0-17分
-        count = scores.count(score)
-        percentage = (count / len(scores) * 100) if scores else 0
-        score_distribution.append({
+    score_counts = dataset.score_distribution()
+    score_bounds = dataset.score_distribution_bounds() if approx else None
+    total_sessions = sum(score_counts.values())
+    
+    for score in range(SCORED_MAX_ORDER + 1):  # 0-17分
+        count = score_counts.get(score, 0)
+        percentage = (count / total_sessions * 100) if total_sessions else 0
+        score_entry = {
             'score': score,
             'count': count,
             'percentage': round(percentage, 1)
-        })
+        }
+        if approx:
+            score_entry['count_bounds'] = score_bounds.get(score, (0, 0))
+        score_distribution.append(score_entry)
     
-    return jsonify({
-        'total_responses': total_responses,
+    result = {
+        'total_responses': dataset.total_responses,
         'question_stats': question_stats,
         'score_distribution': score_distribution
-    })
+    }
+    if approx:
+        # 估計值按首尾不完整兩日的時間比例推算，真實值必定落在 [下界, 上界] 之內
+        result['approximate'] = True
+        result['total_responses_bounds'] = dataset.total_responses_bounds
+    return result
 
 @quiz_bp.route('/api/admin/clear_data', methods=['POST'])
 def clear_data():
@@ -572,18 +514,57 @@ def clear_data():
     
     if clear_all:
         Response.query.delete()
+        SessionSummary.query.delete()
+        clear_counters()
+        clear_rollups()
     else:
-        query = Response.query
-        if start_date:
-            query = query.filter(Response.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Response.created_at <= datetime.fromisoformat(end_date))
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+        query = Response.query.filter(*date_range_filters(start, end))
+        # 先從統計計數中扣除將被刪除的回應
+        apply_responses(query.with_entities(Response.question_id, Response.answer, Response.is_correct).yield_per(5000), sign=-1)
+        affected_sessions = [row[0] for row in query.with_entities(Response.session_id).distinct()]
+        affected_days = session_days(affected_sessions)
         query.delete()
+        resync_session_summaries(affected_sessions)
+        rebuild_rollups(start, end)
+        # 部分回應在範圍外的舊提交分數也會改變，其提交日期在範圍外時另行重建該日
+        for day in affected_days:
+            if (start and day < floor_day(start)) or (end and day > end):
+                rebuild_rollups(day, day)
+        refresh_session_count()
     
     db.session.commit()
+    bump_data_version()
+    publish_reset()
     return jsonify({'success': True})
 
 
+@quiz_bp.route('/api/admin/ingest/metrics', methods=['GET'])
+def get_ingest_metrics():
+    """獲取提交寫入隊列的運行指標（隊列深度、批量寫入延遲等）"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    writer = get_submission_writer()
+    if not writer:
+        return jsonify({'mode': 'direct'})
+    
+    return jsonify({'mode': 'write_behind', **writer.metrics()})
+
+
+@quiz_bp.route('/api/admin/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """獲取應用內緩存的命中、未命中及淘汰次數"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    return jsonify({
+        'recommendations': recommendation_cache_stats(),
+        'stats': stats_cache_stats()
+    })
+
+
 # 問題管理API端點
 
 @quiz_bp.route('/api/admin/questions', methods=['GET'])
@@ -624,6 +605,9 @@ def add_question():
     
     db.session.add(question)
     db.session.commit()
+    invalidate_question_bank()
+    bump_data_version()
+    publish_reset()
     
     return jsonify({
         'success': True,
@@ -645,6 +629,7 @@ def update_question(question_id):
     
     question = Question.query.get_or_404(question_id)
     data = request.json
+    type_changed = question.question_type != data['question_type']
     
     question.content = data['content']
     question.question_type = data['question_type']
@@ -652,6 +637,16 @@ def update_question(question_id):
     question.correct_answer = data.get('correct_answer')
     
     db.session.commit()
+    invalidate_question_bank()
+    
+    # 題型改變後選項計數規則隨之改變，按新題型重算答案位掩碼並重建計數
+    if type_changed:
+        refresh_answer_masks(question_id)
+        rebuild_counters()
+        rebuild_rollups()
+        db.session.commit()
+    bump_data_version()
+    publish_reset()
     
     return jsonify({
         'success': True,
@@ -673,12 +668,19 @@ def delete_question(question_id):
     
     question = Question.query.get_or_404(question_id)
     
-    # 刪除相關的回應記錄
+    # 刪除相關的回應記錄及統計計數
     Response.query.filter_by(question_id=question_id).delete()
+    delete_question_counters(question_id)
+    resync_session_summaries()
+    rebuild_rollups()
+    refresh_session_count()
     
     # 刪除問題
     db.session.delete(question)
     db.session.commit()
+    invalidate_question_bank()
+    bump_data_version()
+    publish_reset()
     
     return jsonify({'success': True})
 
@@ -697,6 +699,9 @@ def reorder_questions():
             question.order = item['order']
     
     db.session.commit()
+    invalidate_question_bank()
+    bump_data_version()
+    publish_reset()
     return jsonify({'success': True})
 
 # 課程管理API端點
@@ -742,6 +747,8 @@ def add_course():
     
     db.session.add(course)
     db.session.commit()
+    invalidate_course_catalog()
+    invalidate_recommendations()
     
     return jsonify({
         'success': True,
@@ -777,6 +784,8 @@ def update_course(course_id):
         course.interest_tags = json.dumps(data.get('interest_tags', []))
     
     db.session.commit()
+    invalidate_course_catalog()
+    invalidate_recommendations()
     
     return jsonify({
         'success': True,
@@ -800,6 +809,8 @@ def delete_course(course_id):
     course = Course.query.get_or_404(course_id)
     db.session.delete(course)
     db.session.commit()
+    invalidate_course_catalog()
+    invalidate_recommendations()
     
     return jsonify({'success': True})
 
@@ -860,6 +871,45 @@ def update_admin_profile():
 
 # 數據導出API端點
 
+@quiz_bp.route('/api/admin/export/raw', methods=['GET'])
+def export_raw():
+    """
+    流式導出原始回應（CSV或NDJSON），每行一條回應（rows=response）或一次提交（rows=session）
+    按id keyset分頁分批讀取，客戶端接受gzip時逐塊壓縮傳輸
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    export_format = request.args.get('format', 'csv')
+    rows = request.args.get('rows', ROWS_PER_RESPONSE)
+    if export_format not in RAW_EXPORT_FORMATS:
+        return jsonify({'error': '不支持的導出格式'}), 400
+    if rows not in (ROWS_PER_RESPONSE, ROWS_PER_SESSION):
+        return jsonify({'error': '不支持的導出行類型'}), 400
+    
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return jsonify({'error': '日期格式錯誤'}), 400
+    
+    chunks = iter_raw_export(export_format, rows, start, end)
+    headers = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no', 'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip'] > 0:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    filename = f'攝影問卷原始數據_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+    headers['Content-Disposition'] = f"attachment; filename=raw_export.{export_format}; filename*=UTF-8''{quote(filename)}"
+    response = current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=RAW_EXPORT_FORMATS[export_format],
+        headers=headers
+    )
+    return response
+
 @quiz_bp.route('/api/admin/export/excel', methods=['GET', 'POST'])
 def export_excel():
     """導出Excel格式的統計數據"""
@@ -867,10 +917,7 @@ def export_excel():
         return jsonify({'error': '未登錄'}), 401
     
     try:
-        import openpyxl
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from openpyxl.chart import BarChart, Reference
-        import io
+        import tempfile
         import base64
         
         # 處理GET和POST請求
@@ -879,183 +926,39 @@ def export_excel():
         else:
             data = request.args
         
+        # format=xlsx 時直接下載二進制文件，否則沿用base64 JSON
+        as_attachment = data.get('format') == 'xlsx'
+        
+        # 獲取篩選後的統計（與詳細統計共用報告數據集）
         start_date = data.get('start_date')
         end_date = data.get('end_date')
-        
-        # 獲取篩選後的數據
-        query = Response.query
-        if start_date:
-            query = query.filter(Response.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Response.created_at <= datetime.fromisoformat(end_date))
-        
-        responses = query.all()
-        
-        # 創建Excel工作簿
-        wb = openpyxl.Workbook()
-        
-        # 總覽工作表
-        ws_summary = wb.active
-        ws_summary.title = "統計總覽"
-        
-        # 設置標題樣式
-        title_font = Font(size=16, bold=True)
-        header_font = Font(size=12, bold=True)
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        
-        # 總覽數據
-        total_responses = len(set(r.session_id for r in responses))
-        questions = Question.query.order_by(Question.order).all()
-        total_questions = len(questions)
-        
-        # 計算平均分數
-        session_scores = {}
-        for response in responses:
-            if response.session_id not in session_scores:
-                session_scores[response.session_id] = {'correct': 0, 'total': 0}
-            if response.question_id <= 17:  # 技術問題
-                session_scores[response.session_id]['total'] += 1
-                if response.is_correct:
-                    session_scores[response.session_id]['correct'] += 1
-        
-        avg_score = sum(s['correct'] for s in session_scores.values()) / len(session_scores) if session_scores else 0
-        
-        # 寫入總覽數據
-        ws_summary['A1'] = "攝影問卷系統統計報告"
-        ws_summary['A1'].font = title_font
-        ws_summary['A3'] = "統計期間："
-        ws_summary['B3'] = f"{start_date or '開始'} 至 {end_date or '現在'}"
-        ws_summary['A4'] = "總回應數："
-        ws_summary['B4'] = total_responses
-        ws_summary['A5'] = "問題總數："
-        ws_summary['B5'] = total_questions
-        ws_summary['A6'] = "平均分數："
-        ws_summary['B6'] = f"{avg_score:.1f}"
-        
-        # 新增：參與者分數統計
-        ws_summary['A8'] = "參與者分數分布統計"
-        ws_summary['A8'].font = header_font
-        
-        # 計算分數分布
-        score_distribution = {}
-        for session_id, score_data in session_scores.items():
-            score = score_data['correct']
-            if score not in score_distribution:
-                score_distribution[score] = 0
-            score_distribution[score] += 1
-        
-        # 寫入分數分布統計
-        row = 9
-        ws_summary[f'A{row}'] = "分數"
-        ws_summary[f'B{row}'] = "人數"
-        ws_summary[f'C{row}'] = "百分比"
-        
-        # 設置表頭樣式
-        for col in ['A', 'B', 'C']:
-            cell = ws_summary[f'{col}{row}']
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-        
-        row += 1
-        for score in sorted(score_distribution.keys()):
-            count = score_distribution[score]
-            percentage = (count / total_responses * 100) if total_responses > 0 else 0
-            
-            ws_summary[f'A{row}'] = f"{score}分"
-            ws_summary[f'B{row}'] = count
-            ws_summary[f'C{row}'] = f"{percentage:.1f}%"
-            
-            # 設置對齊方式
-            ws_summary[f'A{row}'].alignment = Alignment(horizontal='center')
-            ws_summary[f'B{row}'].alignment = Alignment(horizontal='center')
-            ws_summary[f'C{row}'].alignment = Alignment(horizontal='center')
-            
-            row += 1
-        
-        # 添加總計行
-        ws_summary[f'A{row}'] = "總計"
-        ws_summary[f'A{row}'].font = header_font
-        ws_summary[f'B{row}'] = total_responses
-        ws_summary[f'B{row}'].font = header_font
-        ws_summary[f'C{row}'] = "100.0%"
-        ws_summary[f'C{row}'].font = header_font
-        
-        # 設置總計行樣式
-        for col in ['A', 'B', 'C']:
-            cell = ws_summary[f'{col}{row}']
-            cell.alignment = Alignment(horizontal='center')
-            cell.fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
-        
-        # 詳細統計工作表
-        ws_detail = wb.create_sheet("詳細統計")
-        
-        # 設置表頭
-        headers = ['問題編號', '問題內容', '問題類型', '總回答數', '正確答案數', '正確率(%)', '選項1', '選項1人數', '選項1比例(%)', '選項2', '選項2人數', '選項2比例(%)', '選項3', '選項3人數', '選項3比例(%)', '選項4', '選項4人數', '選項4比例(%)']
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws_detail.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-        
-        # 填入問題統計數據
-        for row, question in enumerate(questions, 2):
-            question_responses = [r for r in responses if r.question_id == question.id]
-            total_answers = len(question_responses)
-            
-            if question.order <= 17:  # 技術問題
-                correct_answers = len([r for r in question_responses if r.is_correct])
-                correct_rate = (correct_answers / total_answers * 100) if total_answers > 0 else 0
-            else:
-                correct_answers = 0
-                correct_rate = 0
-            
-            ws_detail.cell(row=row, column=1, value=question.order)
-            ws_detail.cell(row=row, column=2, value=question.content)
-            ws_detail.cell(row=row, column=3, value='單選題' if question.question_type == 'single' else '多選題')
-            ws_detail.cell(row=row, column=4, value=total_answers)
-            ws_detail.cell(row=row, column=5, value=correct_answers)
-            ws_detail.cell(row=row, column=6, value=f"{correct_rate:.1f}")
-            
-            # 選項統計
-            for i, option in enumerate(question.options[:4]):  # 最多4個選項
-                if question.question_type == 'single':
-                    count = len([r for r in question_responses if r.answer == i])
-                else:
-                    count = len([r for r in question_responses if i in (r.answer or [])])
-                
-                percentage = (count / total_answers * 100) if total_answers > 0 else 0
-                
-                ws_detail.cell(row=row, column=7 + i*3, value=option)
-                ws_detail.cell(row=row, column=8 + i*3, value=count)
-                ws_detail.cell(row=row, column=9 + i*3, value=f"{percentage:.1f}")
-        
-        # 調整列寬
-        for column in ws_detail.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws_detail.column_dimensions[column_letter].width = adjusted_width
-        
-        # 保存到內存
-        excel_buffer = io.BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+        report = get_report_dataset(start, end)
+        
+        # 保存到臨時文件（關閉後自動刪除），不在內存中保留整個文件
+        excel_file = tempfile.TemporaryFile()
+        render_excel(report, excel_file)
+        excel_file.seek(0)
+        filename = f'攝影問卷統計_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        
+        if as_attachment:
+            # 以二進制附件分塊發送，無需base64編碼
+            return send_file(
+                excel_file,
+                mimetype=EXPORT_FORMATS['excel'][1],
+                as_attachment=True,
+                download_name=filename
+            )
         
         # 轉換為base64
-        excel_data = base64.b64encode(excel_buffer.getvalue()).decode()
+        with excel_file:
+            excel_data = base64.b64encode(excel_file.read()).decode()
         
         return jsonify({
             'success': True,
             'data': excel_data,
-            'filename': f'攝影問卷統計_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+            'filename': filename
         })
         
     except Exception as e:
@@ -1068,191 +971,25 @@ def export_powerpoint():
         return jsonify({'error': '未登錄'}), 401
     
     try:
-        from pptx import Presentation
-        from pptx.util import Inches, Pt
-        from pptx.enum.text import PP_ALIGN
-        from pptx.dml.color import RGBColor
-        import matplotlib.pyplot as plt
-        import seaborn as sns
         import io
         import base64
-        import tempfile
-        import os
         
         # 處理GET和POST請求
         if request.method == 'POST':
             data = request.json or {}
         else:
             data = request.args
-            
+        
+        # 獲取篩選後的統計（與詳細統計共用報告數據集）
         start_date = data.get('start_date')
         end_date = data.get('end_date')
-        
-        # 獲取篩選後的數據
-        query = Response.query
-        if start_date:
-            query = query.filter(Response.created_at >= datetime.fromisoformat(start_date))
-        if end_date:
-            query = query.filter(Response.created_at <= datetime.fromisoformat(end_date))
-        
-        responses = query.all()
-        questions = Question.query.order_by(Question.order).all()
-        
-        # 創建PowerPoint演示文稿
-        prs = Presentation()
-        
-        # 設置中文字體
-        plt.rcParams['font.sans-serif'] = ['DejaVu Sans', 'SimHei', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
-        
-        # 第一張幻燈片：標題頁
-        slide_layout = prs.slide_layouts[0]  # 標題幻燈片
-        slide = prs.slides.add_slide(slide_layout)
-        title = slide.shapes.title
-        subtitle = slide.placeholders[1]
-        
-        title.text = "攝影問卷系統統計報告"
-        subtitle.text = f"統計期間：{start_date or '開始'} 至 {end_date or '現在'}"
-        
-        # 第二張幻燈片：總覽統計
-        slide_layout = prs.slide_layouts[1]  # 標題和內容
-        slide = prs.slides.add_slide(slide_layout)
-        title = slide.shapes.title
-        title.text = "統計總覽"
-        
-        # 計算統計數據
-        total_responses = len(set(r.session_id for r in responses))
-        total_questions = len(questions)
-        
-        session_scores = {}
-        for response in responses:
-            if response.session_id not in session_scores:
-                session_scores[response.session_id] = {'correct': 0, 'total': 0}
-            if response.question_id <= 17:  # 技術問題
-                session_scores[response.session_id]['total'] += 1
-                if response.is_correct:
-                    session_scores[response.session_id]['correct'] += 1
-        
-        avg_score = sum(s['correct'] for s in session_scores.values()) / len(session_scores) if session_scores else 0
-        
-        # 添加文本框
-        left = Inches(1)
-        top = Inches(2)
-        width = Inches(8)
-        height = Inches(4)
-        
-        textbox = slide.shapes.add_textbox(left, top, width, height)
-        text_frame = textbox.text_frame
-        
-        p = text_frame.paragraphs[0]
-        p.text = f"總回應數：{total_responses}"
-        p.font.size = Pt(24)
-        
-        p = text_frame.add_paragraph()
-        p.text = f"問題總數：{total_questions}"
-        p.font.size = Pt(24)
-        
-        p = text_frame.add_paragraph()
-        p.text = f"平均分數：{avg_score:.1f}"
-        p.font.size = Pt(24)
-        
-        # 第三張幻燈片：正確率圖表
-        slide_layout = prs.slide_layouts[5]  # 空白幻燈片
-        slide = prs.slides.add_slide(slide_layout)
-        
-        # 添加標題
-        title_shape = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1))
-        title_frame = title_shape.text_frame
-        title_para = title_frame.paragraphs[0]
-        title_para.text = "各題正確率統計"
-        title_para.font.size = Pt(28)
-        title_para.font.bold = True
-        title_para.alignment = PP_ALIGN.CENTER
-        
-        # 創建正確率圖表
-        question_numbers = []
-        correct_rates = []
-        
-        for question in questions[:17]:  # 只統計技術問題
-            question_responses = [r for r in responses if r.question_id == question.id]
-            total_answers = len(question_responses)
-            correct_answers = len([r for r in question_responses if r.is_correct])
-            correct_rate = (correct_answers / total_answers * 100) if total_answers > 0 else 0
-            
-            question_numbers.append(f"Q{question.order}")
-            correct_rates.append(correct_rate)
-        
-        # 創建圖表
-        plt.figure(figsize=(12, 6))
-        bars = plt.bar(question_numbers, correct_rates, color='#4472C4', alpha=0.8)
-        plt.title('各題正確率統計', fontsize=16, fontweight='bold')
-        plt.xlabel('問題編號', fontsize=12)
-        plt.ylabel('正確率 (%)', fontsize=12)
-        plt.ylim(0, 100)
-        
-        # 在柱狀圖上添加數值標籤
-        for bar, rate in zip(bars, correct_rates):
-            plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 1, 
-                    f'{rate:.1f}%', ha='center', va='bottom', fontsize=10)
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # 保存圖表到臨時文件
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            plt.savefig(tmp_file.name, dpi=300, bbox_inches='tight')
-            chart_path = tmp_file.name
-        plt.close()
-        
-        # 添加圖表到幻燈片
-        left = Inches(1)
-        top = Inches(1.5)
-        width = Inches(8)
-        height = Inches(5)
-        slide.shapes.add_picture(chart_path, left, top, width, height)
-        
-        # 清理臨時文件
-        os.unlink(chart_path)
-        
-        # 第四張幻燈片：回應分布圖
-        slide_layout = prs.slide_layouts[5]  # 空白幻燈片
-        slide = prs.slides.add_slide(slide_layout)
-        
-        # 添加標題
-        title_shape = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1))
-        title_frame = title_shape.text_frame
-        title_para = title_frame.paragraphs[0]
-        title_para.text = "分數分布統計"
-        title_para.font.size = Pt(28)
-        title_para.font.bold = True
-        title_para.alignment = PP_ALIGN.CENTER
-        
-        # 創建分數分布圖
-        scores = [s['correct'] for s in session_scores.values()]
-        
-        plt.figure(figsize=(10, 6))
-        plt.hist(scores, bins=range(0, max(scores)+2), color='#70AD47', alpha=0.8, edgecolor='black')
-        plt.title('分數分布統計', fontsize=16, fontweight='bold')
-        plt.xlabel('正確答題數', fontsize=12)
-        plt.ylabel('人數', fontsize=12)
-        plt.grid(axis='y', alpha=0.3)
-        
-        # 保存圖表到臨時文件
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-            plt.savefig(tmp_file.name, dpi=300, bbox_inches='tight')
-            chart_path = tmp_file.name
-        plt.close()
-        
-        # 添加圖表到幻燈片
-        slide.shapes.add_picture(chart_path, left, top, width, height)
-        
-        # 清理臨時文件
-        os.unlink(chart_path)
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+        report = get_report_dataset(start, end)
         
         # 保存PowerPoint到內存
         ppt_buffer = io.BytesIO()
-        prs.save(ppt_buffer)
-        ppt_buffer.seek(0)
+        render_powerpoint(report, ppt_buffer)
         
         # 轉換為base64
         ppt_data = base64.b64encode(ppt_buffer.getvalue()).decode()
@@ -1266,6 +1003,69 @@ def export_powerpoint():
     except Exception as e:
         return jsonify({'error': f'導出PowerPoint失敗: {str(e)}'}), 500
 
+@quiz_bp.route('/api/admin/export/jobs', methods=['POST'])
+def create_export_job():
+    """
+    建立後台導出任務，立即返回任務id（202）
+    格式及日期範圍相同且數據未變的請求合併為同一任務，完成的文件在過期前可重複下載
+    """
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    manager = get_export_jobs()
+    if manager is None:
+        return jsonify({'error': '後台導出未啟用'}), 503
+    
+    data = request.json or {}
+    export_format = data.get('format')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': '不支持的導出格式'}), 400
+    
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        return jsonify({'error': '日期格式錯誤'}), 400
+    
+    job, coalesced = manager.submit(export_format, start, end)
+    if job is None:
+        return jsonify({'error': '導出任務過多，請稍後再試'}), 503
+    
+    return jsonify({'success': True, 'coalesced': coalesced, 'job': job.to_dict()}), 202
+
+@quiz_bp.route('/api/admin/export/jobs/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    """查詢導出任務狀態"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    manager = get_export_jobs()
+    job = manager.get(job_id) if manager is not None else None
+    if job is None:
+        return jsonify({'error': '導出任務不存在或已過期'}), 404
+    
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@quiz_bp.route('/api/admin/export/jobs/<job_id>/download', methods=['GET'])
+def download_export_job(job_id):
+    """下載已完成的導出文件"""
+    if not session.get('admin_logged_in'):
+        return jsonify({'error': '未登錄'}), 401
+    
+    manager = get_export_jobs()
+    job = manager.get(job_id) if manager is not None else None
+    if job is None:
+        return jsonify({'error': '導出任務不存在或已過期'}), 404
+    if job.status != STATUS_DONE:
+        return jsonify({'error': '導出任務尚未完成', 'job': job.to_dict()}), 409
+    
+    try:
+        return send_file(job.path, mimetype=job.mimetype, as_attachment=True, download_name=job.filename)
+    except FileNotFoundError:
+        return jsonify({'error': '導出任務不存在或已過期'}), 404
+
 
 
 # ==================== 評分設定管理API ====================
@@ -1337,6 +1137,8 @@ def update_score_setting(setting_id):
         setting.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_level_table()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1392,6 +1194,8 @@ def create_score_setting():
         
         db.session.add(new_setting)
         db.session.commit()
+        invalidate_level_table()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1413,6 +1217,8 @@ def delete_score_setting(setting_id):
         
         db.session.delete(setting)
         db.session.commit()
+        invalidate_level_table()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1423,24 +1229,17 @@ def delete_score_setting(setting_id):
         db.session.rollback()
         return jsonify({'error': f'刪除評分設定失敗: {str(e)}'}), 500
 
-def get_user_level_by_score(score):
-    """根據分數獲取用戶等級"""
+def get_user_level_and_color(score):
+    """根據分數獲取用戶等級及其顯示顏色（查詢由評分設定編譯的等級表）"""
     try:
-        setting = ScoreSettings.query.filter(
-            ScoreSettings.is_active == True,
-            ScoreSettings.min_score <= score,
-            ScoreSettings.max_score >= score
-        ).first()
-        
-        if setting:
-            return setting.level_name
-        else:
-            # 如果沒有匹配的設定，返回默認值
-            return '未分類'
-            
+        return get_level_table().lookup(score)
     except Exception as e:
         print(f"獲取用戶等級失敗: {str(e)}")
-        return '未分類'
+        return UNMATCHED
+
+def get_user_level_by_score(score):
+    """根據分數獲取用戶等級"""
+    return get_user_level_and_color(score)[0]
 
 
 
@@ -1506,6 +1305,8 @@ def create_recommendation_setting():
         
         db.session.add(new_setting)
         db.session.commit()
+        invalidate_active_recommendation_setting()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1569,6 +1370,8 @@ def update_recommendation_setting(setting_id):
         
         setting.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_active_recommendation_setting()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1602,6 +1405,8 @@ def delete_recommendation_setting(setting_id):
         
         db.session.delete(setting)
         db.session.commit()
+        invalidate_active_recommendation_setting()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1628,6 +1433,8 @@ def activate_recommendation_setting(setting_id):
         setting.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_active_recommendation_setting()
+        invalidate_recommendations()
         
         return jsonify({
             'success': True,
@@ -1645,27 +1452,10 @@ def activate_recommendation_setting(setting_id):
         return jsonify({'error': f'啟用推薦設定失敗: {str(e)}'}), 500
 
 def get_active_recommendation_setting():
-    """獲取當前啟用的推薦設定"""
+    """獲取當前啟用的推薦設定（由推薦設定管理端點刷新的快照）"""
     try:
-        active_setting = RecommendationSettings.query.filter_by(is_active=True).first()
-        if active_setting:
-            return {
-                'min_courses': active_setting.min_courses,
-                'max_courses': active_setting.max_courses,
-                'setting_name': active_setting.setting_name
-            }
-        else:
-            # 如果沒有啟用的設定，返回默認值
-            return {
-                'min_courses': 3,
-                'max_courses': 8,
-                'setting_name': 'default'
-            }
+        return get_active_recommendation_snapshot()
     except Exception as e:
         print(f"獲取推薦設定失敗: {str(e)}")
-        return {
-            'min_courses': 3,
-            'max_courses': 8,
-            'setting_name': 'default'
-        }
+        return DEFAULT_RECOMMENDATION_SETTING
 
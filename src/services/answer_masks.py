@@ -0,0 +1,71 @@
+"""
+答案位掩碼
+提交時按題型把所選選項編碼為整數（第i個選項為第i位，單選題只有一位），寫入 Response.answer_mask，
+統計選項及興趣時以位運算代替解析JSON；無法編碼的答案（選項索引超出0-62）存為NULL，統計時改為解析JSON
+"""
+
+from sqlalchemy import text
+
+from ..models.quiz import db
+
+MAX_MASK_BIT = 62  # SQLite INTEGER為64位有符號整數，只使用0-62位
+
+# 與 answer_mask() 相同規則的SQL表達式（題型取自question表，題目不存在時為NULL），用於回填及題型改變後重算
+ANSWER_MASK_SQL = f"""(
+    SELECT CASE
+        WHEN question.question_type = 'single' THEN CASE json_type(response.answer)
+            WHEN 'integer' THEN CASE WHEN json_extract(response.answer, '$') BETWEEN 0 AND {MAX_MASK_BIT}
+                THEN 1 << json_extract(response.answer, '$') END
+            WHEN 'true' THEN 2
+            WHEN 'false' THEN 1
+            ELSE 0 END
+        WHEN json_type(response.answer) = 'array' THEN CASE
+            WHEN EXISTS (
+                SELECT 1 FROM json_each(response.answer) AS element
+                WHERE element.type = 'integer' AND element.value NOT BETWEEN 0 AND {MAX_MASK_BIT}
+            ) THEN NULL
+            ELSE (
+                SELECT coalesce(sum(DISTINCT 1 << element.value), 0) FROM json_each(response.answer) AS element
+                WHERE element.type IN ('integer', 'true', 'false')
+            ) END
+        ELSE 0 END
+    FROM question WHERE question.id = response.question_id
+)"""
+
+
+def selected_options(question_type, answer):
+    """回答中被選中的選項索引：單選題比較整數答案，其他題型檢查列表成員"""
+    if question_type == 'single':
+        return (answer,) if isinstance(answer, int) else ()
+    if isinstance(answer, list):
+        return {i for i in answer if isinstance(i, int)}
+    return ()
+
+
+def answer_mask(question_type, answer):
+    """按題型編碼答案的位掩碼，無法編碼時返回None"""
+    mask = 0
+    for option_index in selected_options(question_type, answer):
+        if not 0 <= option_index <= MAX_MASK_BIT:
+            return None
+        mask |= 1 << option_index
+    return mask
+
+
+def mask_options(mask):
+    """位掩碼中被選中的選項索引（遞增）"""
+    options = []
+    while mask:
+        low_bit = mask & -mask
+        options.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return options
+
+
+def refresh_answer_masks(question_id=None):
+    """按目前題型重算位掩碼（題型改變後調用，不負責commit），不指定題目時重算全部"""
+    statement = f'UPDATE response SET answer_mask = {ANSWER_MASK_SQL}'
+    if question_id is None:
+        db.session.execute(text(statement))
+    else:
+        db.session.execute(text(statement + ' WHERE response.question_id = :question_id'), {'question_id': question_id})
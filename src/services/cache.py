@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+
+
+class VersionedSnapshot:
+    """
+    以版本號管理的唯讀快照
+    首次讀取時呼叫loader載入，invalidate()後於下次讀取時重新載入
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._version = 0
+        self._state = None  # (version, value)
+
+    @property
+    def version(self):
+        return self._version
+
+    def get(self):
+        """返回快照內容"""
+        return self.current()[1]
+
+    def current(self):
+        """返回 (版本號, 快照內容)，兩者保證一致"""
+        state = self._state
+        if state is not None:
+            return state
+
+        with self._lock:
+            # 等待鎖期間可能已被其他線程載入
+            if self._state is None:
+                self._state = (self._version, self._loader())
+            return self._state
+
+    def invalidate(self):
+        # 與載入共用同一把鎖，確保載入中的舊數據不會在失效後被保留
+        with self._lock:
+            self._version += 1
+            self._state = None
+
+
+class LRUCache:
+    """線程安全的有界LRU緩存，記錄命中、未命中及淘汰次數"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions
+            }
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """
+    有界LRU結果緩存，相同鍵的並發未命中只計算一次（single-flight）
+    其他請求等待同一次計算的結果；計算失敗時一同收到異常，且不寫入緩存
+    """
+
+    def __init__(self, max_entries):
+        self._entries = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._shared = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            # 在鎖內查找：計算完成時先寫入緩存再移除進行中的記錄，兩者之間不會漏判
+            value = self._entries.get(key)
+            if value is not None:
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            self._entries.put(key, flight.value)
+            return flight.value
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        with self._lock:
+            stats['shared'] = self._shared
+            stats['in_flight'] = len(self._flights)
+        return stats
@@ -0,0 +1,75 @@
+import json
+
+from ..models.quiz import Course
+from .cache import VersionedSnapshot
+
+
+def parse_interest_tags(value):
+    """興趣標籤可能以列表或JSON字符串存儲，統一轉換為列表"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    try:
+        tags = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return tags if isinstance(tags, list) else []
+
+
+class CourseEntry:
+    """開啟課程的唯讀快照"""
+
+    __slots__ = ('id', 'title', 'category', 'description', 'level')
+
+    def __init__(self, course):
+        self.id = course.id
+        self.title = course.title
+        self.category = course.category
+        self.description = course.description
+        self.level = course.level
+
+    def to_dict(self, priority=1):
+        """轉換為推薦格式"""
+        return {
+            'title': self.title,
+            'category': self.category,
+            'description': self.description,
+            'level': self.level,
+            'priority': priority
+        }
+
+
+class CourseCatalog:
+    """開啟課程目錄及興趣標籤倒排索引（標籤 → 按課程ID排序的課程列表）"""
+
+    def __init__(self, courses):
+        self.courses = tuple(CourseEntry(c) for c in courses)
+        index = {}
+        for entry, course in zip(self.courses, courses):
+            for tag in parse_interest_tags(course.interest_tags):
+                bucket = index.setdefault(tag, [])
+                # 同一課程重複的標籤只索引一次
+                if not bucket or bucket[-1] is not entry:
+                    bucket.append(entry)
+        self.interest_index = {tag: tuple(entries) for tag, entries in index.items()}
+
+    def courses_for_interest(self, interest):
+        return self.interest_index.get(interest, ())
+
+
+def _load_course_catalog():
+    return CourseCatalog(Course.query.filter_by(is_active=True).order_by(Course.id).all())
+
+
+_course_catalog = VersionedSnapshot(_load_course_catalog)
+
+
+def get_course_catalog():
+    """獲取開啟課程目錄快照，推薦時不再逐個課程解析興趣標籤"""
+    return _course_catalog.get()
+
+
+def invalidate_course_catalog():
+    """課程新增、修改或刪除後調用"""
+    _course_catalog.invalidate()
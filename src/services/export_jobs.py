@@ -0,0 +1,235 @@
+"""
+後台報告導出任務
+請求線程取得報告數據集後交給有界的進程池渲染，文件寫入本地目錄，由後台線程定期刪除過期任務；
+格式、日期範圍及數據版本相同的並發請求合併為同一任務
+任務記錄保存在內存中，請以單進程方式部署（見Procfile）；啟動時清除上次運行殘留的文件
+工作進程異常退出後進程池不再重建（見 ExportJobManager.start），之後的導出任務直接失敗，須重新啟動服務
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from .report_render import EXPORT_FORMATS, render_report
+from .reports import get_report_dataset
+from .stats_cache import current_data_version
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+POOL_UNAVAILABLE = '導出進程池不可用，請重新啟動服務'
+
+
+class ExportJob:
+    __slots__ = ('id', 'export_format', 'key', 'status', 'path', 'filename', 'error', 'created_at', 'finished_at')
+
+    def __init__(self, export_format, key, directory):
+        extension = EXPORT_FORMATS[export_format][0]
+        self.id = uuid.uuid4().hex
+        self.export_format = export_format
+        self.key = key
+        self.status = STATUS_PENDING
+        self.path = os.path.join(directory, f'{self.id}.{extension}')
+        self.filename = f'攝影問卷統計_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def mimetype(self):
+        return EXPORT_FORMATS[self.export_format][1]
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'format': self.export_format,
+            'start_date': self.key[1].isoformat() if self.key[1] else None,
+            'end_date': self.key[2].isoformat() if self.key[2] else None,
+            'status': self.status,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+            'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            'status_url': f'/api/admin/export/jobs/{self.id}',
+            'download_url': f'/api/admin/export/jobs/{self.id}/download' if self.status == STATUS_DONE else None
+        }
+
+
+class ExportJobManager:
+    """
+    max_workers: 同時渲染的進程數；max_pending: 未完成任務上限，超出時拒絕新任務
+    ttl: 任務完成後保留文件及狀態的秒數；max_finished: 保留的已完成任務上限，超出時先刪除最早完成的
+    sweep_interval: 後台線程清除過期任務的間隔秒數
+    """
+
+    def __init__(self, directory, max_workers=2, ttl=3600, max_pending=16, max_finished=100, sweep_interval=60):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_key = {}
+        self._executor = None
+        self._stop = threading.Event()
+        self._sweeper = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """
+        清除殘留文件並預先啟動工作進程
+        使用fork啟動：spawn及forkserver會在子進程中重新執行main.py的初始化；
+        只在後台寫入等線程啟動前fork一次，子進程不會繼承其他線程持有的鎖，
+        因此進程池損壞後不在請求線程中重建
+        """
+        for name in os.listdir(self.directory):
+            os.unlink(os.path.join(self.directory, name))
+        self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('fork'))
+        self._executor.submit(os.getpid).result()
+
+        # 清除線程在fork之後才啟動
+        self._sweeper = threading.Thread(target=self._sweep, name='export-job-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, export_format, start=None, end=None):
+        """
+        返回 (任務, 是否合併到現有任務)；未完成任務已達上限時返回 (None, False)
+        在請求線程中調用，需要應用上下文
+        """
+        key = (export_format, start, end, current_data_version())
+        with self._lock:
+            self._expire()
+            job = self._by_key.get(key)
+            if job is not None:
+                return job, True
+            pending = sum(1 for job in self._jobs.values() if job.status == STATUS_PENDING)
+            if pending >= self.max_pending:
+                return None, False
+
+            job = ExportJob(export_format, key, self.directory)
+            # 讀取數據前即登記，讀取期間到達的相同請求也會合併
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+
+        try:
+            report = get_report_dataset(start, end)
+            future = self._submit_render(export_format, report, job.path)
+        except Exception as e:
+            self._finish(job, error=str(e))
+            return job, False
+
+        future.add_done_callback(lambda future: self._finish(job, future=future))
+        return job, False
+
+    def _submit_render(self, export_format, report, path):
+        with self._lock:
+            executor = self._executor
+        if executor is None:
+            raise RuntimeError(POOL_UNAVAILABLE)
+        try:
+            return executor.submit(render_report, export_format, report, path)
+        except BrokenProcessPool:
+            self._discard_pool()
+            raise RuntimeError(POOL_UNAVAILABLE)
+
+    def _discard_pool(self):
+        """工作進程異常退出後進程池不再可用：停用進程池，之後的任務直接失敗"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            print(f"導出工作進程異常退出，已停用導出進程池: {POOL_UNAVAILABLE}")
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(self, job, future=None, error=None):
+        if future is not None:
+            if future.cancelled():
+                error = '任務已取消'
+            elif future.exception() is not None:
+                if isinstance(future.exception(), BrokenProcessPool):
+                    self._discard_pool()
+                error = str(future.exception()) or type(future.exception()).__name__
+        if error is not None:
+            print(f"導出任務 {job.id} 失敗: {error}")
+
+        with self._lock:
+            job.finished_at = time.time()
+            if error is None:
+                job.status = STATUS_DONE
+            else:
+                job.status = STATUS_FAILED
+                job.error = error
+                # 失敗的任務不再合併，相同請求可重新提交
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+            self._expire()
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def _sweep(self):
+        """後台線程：每隔sweep_interval秒清除過期任務，沒有請求訪問時文件也會按時刪除"""
+        while not self._stop.wait(self.sweep_interval):
+            with self._lock:
+                self._expire()
+
+    def _expire(self):
+        """在鎖內調用：刪除已完成超過ttl秒的任務，以及超出max_finished的最早完成的任務，連同其文件"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished_at is not None), key=lambda job: job.finished_at
+        )
+        deadline = time.time() - self.ttl
+        overflow = max(len(finished) - self.max_finished, 0)
+        for index, job in enumerate(finished):
+            if index >= overflow and job.finished_at >= deadline:
+                break
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            try:
+                os.unlink(job.path)
+            except FileNotFoundError:
+                pass
+
+
+_manager = None
+
+
+def init_export_jobs(app, directory):
+    """啟動時調用（須在其他後台線程啟動之前）"""
+    global _manager
+
+    manager = ExportJobManager(
+        directory,
+        max_workers=app.config.get('EXPORT_WORKERS', 2),
+        ttl=app.config.get('EXPORT_TTL', 3600),
+        max_pending=app.config.get('EXPORT_MAX_PENDING', 16),
+        max_finished=app.config.get('EXPORT_MAX_FINISHED', 100)
+    )
+    manager.start()
+    _manager = manager
+
+    import atexit
+    atexit.register(manager.stop)
+    return manager
+
+
+def get_export_jobs():
+    """返回導出任務管理器，未初始化時為None"""
+    return _manager
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli為可選依賴，未安裝時只提供gzip
+    brotli = None
+
+
+class CachedPayload:
+    """預先序列化並壓縮的響應內容，附帶內容哈希ETag"""
+
+    def __init__(self, body, mimetype, last_modified=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.last_modified = last_modified
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+        # 各編碼分別使用不同的強ETag；壓縮後未變小的編碼不提供
+        self.variants = {None: (body, self.etag)}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.variants['gzip'] = (compressed, f'{self.etag}-gz')
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.variants['br'] = (compressed, f'{self.etag}-br')
+
+    def negotiate(self, accept_encodings):
+        # 優先使用壓縮率較高的brotli
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding] > 0:
+                return encoding
+        return None
+
+
+def make_cached_response(payload, cache_control):
+    """
+    按Accept-Encoding選擇壓縮版本；If-None-Match（或If-Modified-Since）命中時返回304
+    """
+    encoding = payload.negotiate(request.accept_encodings)
+    body, etag = payload.variants[encoding]
+
+    response = current_app.response_class(mimetype=payload.mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    if payload.last_modified is not None:
+        response.last_modified = payload.last_modified
+
+    if request.if_none_match:
+        not_modified = any(request.if_none_match.contains(variant_etag) for _, variant_etag in payload.variants.values())
+    else:
+        not_modified = (
+            payload.last_modified is not None
+            and request.if_modified_since is not None
+            and request.if_modified_since >= payload.last_modified
+        )
+    if not_modified:
+        response.status_code = 304
+        return response
+
+    response.set_data(body)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
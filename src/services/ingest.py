@@ -0,0 +1,346 @@
+"""
+寫後（write-behind）提交模式
+提交先追加到本地日誌並立即返回，由後台線程按批次寫入數據庫；重啟時重放尚未提交的日誌
+日誌為單一進程獨佔，請以單進程方式部署（見Procfile）
+批次多次重試仍失敗時逐筆寫入，仍無法寫入的提交移入死信文件，不會阻塞之後的提交
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from ..models.quiz import Response, db
+from .submissions import commit_submissions
+
+
+def _encode_submission(seq, submission):
+    return json.dumps({
+        'seq': seq,
+        'session_id': submission['session_id'],
+        'created_at': submission['created_at'].isoformat(),
+        'score': submission['score'],
+        'max_score': submission['max_score'],
+        'level': submission.get('level'),
+        'interests': submission.get('interests', []),
+        'responses': [list(row) for row in submission['responses']]
+    }, ensure_ascii=False)
+
+
+def _decode_submission(line):
+    data = json.loads(line)
+    seq = data.pop('seq')
+    data['created_at'] = datetime.fromisoformat(data['created_at'])
+    data['responses'] = [tuple(row) for row in data['responses']]
+    return seq, data
+
+
+class SubmissionJournal:
+    """
+    追加寫入的提交日誌（每行一筆JSON），另以檢查點文件記錄已寫入數據庫的最大序號
+    無法寫入數據庫的提交連同錯誤信息追加到死信文件（.dead），供人工檢查後重新導入
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.checkpoint_path = path + '.checkpoint'
+        self.dead_letter_path = path + '.dead'
+        self._lock = threading.Lock()
+        self._committed_seq = self._read_checkpoint()
+        self._last_seq = self._committed_seq
+        for seq, _ in self._read_entries():
+            self._last_seq = max(self._last_seq, seq)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _read_entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield _decode_submission(line)
+                except (ValueError, KeyError):
+                    # 崩潰時可能留下未寫完的最後一行
+                    continue
+
+    def pending(self):
+        """返回序號大於檢查點（尚未確認寫入數據庫）的日誌記錄"""
+        return [(seq, submission) for seq, submission in self._read_entries() if seq > self._committed_seq]
+
+    def append(self, submission):
+        """追加一筆提交並fsync，返回其序號"""
+        with self._lock:
+            self._last_seq += 1
+            seq = self._last_seq
+            self._file.write(_encode_submission(seq, submission) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return seq
+
+    def dead_letter(self, seq, submission, error):
+        """將無法寫入的提交移入死信文件；調用方隨後以mark_committed越過其序號"""
+        entry = json.loads(_encode_submission(seq, submission))
+        entry['error'] = error
+        entry['dead_lettered_at'] = datetime.now().isoformat()
+        with self._lock:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def mark_committed(self, seq):
+        """記錄序號seq及之前的提交已寫入數據庫；全部寫入後清空日誌"""
+        with self._lock:
+            self._committed_seq = max(self._committed_seq, seq)
+            tmp_path = self.checkpoint_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(str(self._committed_seq))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+
+            if self._committed_seq >= self._last_seq:
+                self._file.truncate(0)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _persist_and_commit(submissions, skip_existing=False):
+    """
+    寫入一批提交並commit
+    重放時skip_existing跳過數據庫中已存在的session（提交後、寫檢查點前崩潰的情況）
+    """
+    if skip_existing:
+        session_ids = [s['session_id'] for s in submissions]
+        existing = {row[0] for row in db.session.query(Response.session_id).filter(
+            Response.session_id.in_(session_ids)
+        ).distinct()}
+        submissions = [s for s in submissions if s['session_id'] not in existing]
+    commit_submissions(submissions)
+
+
+class SubmissionWriter:
+    """
+    後台寫入線程：每累積batch_rows條回應或每flush_interval秒寫入一次
+    寫入失敗時按指數退避重試，共max_retries次後改為逐筆寫入並將失敗的提交移入死信文件
+    """
+
+    def __init__(self, app, journal, batch_rows=100, flush_interval=0.2, max_retries=5, retry_backoff=0.5):
+        self.app = app
+        self.journal = journal
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'enqueued': 0,
+            'committed': 0,
+            'batches': 0,
+            'errors': 0,
+            'failed_batches': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'last_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+        self._thread = threading.Thread(target=self._run, name='submission-writer', daemon=True)
+
+    def replay(self):
+        """重放日誌中尚未寫入數據庫的提交（在啟動線程前調用）"""
+        pending = self.journal.pending()
+        for start in range(0, len(pending), self.batch_rows):
+            batch = pending[start:start + self.batch_rows]
+            try:
+                with self.app.app_context():
+                    try:
+                        _persist_and_commit([submission for _, submission in batch], skip_existing=True)
+                    except Exception:
+                        db.session.rollback()
+                        raise
+            except Exception as e:
+                # 重放時不等待重試，直接逐筆寫入，避免一筆壞數據阻止應用啟動
+                print(f"重放提交失敗，改為逐筆寫入: {str(e)}")
+                self._commit_individually(batch)
+                continue
+            self.journal.mark_committed(batch[-1][0])
+        with self._metrics_lock:
+            self._metrics['replayed'] += len(pending)
+        return len(pending)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def submit(self, submission):
+        """寫入日誌後放入隊列，返回時提交已可在崩潰後恢復"""
+        seq = self.journal.append(submission)
+        self._queue.put((seq, submission))
+        with self._metrics_lock:
+            self._metrics['enqueued'] += 1
+
+    def metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        batches = metrics['batches']
+        total_flush_ms = metrics.pop('total_flush_ms')
+        # 已寫入日誌但尚未寫入數據庫的提交數（包括正在寫入的批次）
+        metrics['queue_depth'] = metrics['enqueued'] - metrics['committed'] - metrics['dead_lettered']
+        metrics['avg_flush_ms'] = round(total_flush_ms / batches, 2) if batches else 0.0
+        metrics['batch_rows'] = self.batch_rows
+        metrics['flush_interval_ms'] = int(self.flush_interval * 1000)
+        return metrics
+
+    def _collect_batch(self):
+        """阻塞等待第一筆提交，再在flush_interval內盡量湊滿batch_rows條回應"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        rows = len(first[1]['responses'])
+        deadline = time.monotonic() + self.flush_interval
+        while rows < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[1]['responses'])
+        return batch
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        with self.app.app_context():
+            try:
+                _persist_and_commit([submission for _, submission in batch])
+            except Exception:
+                db.session.rollback()
+                raise
+        self.journal.mark_committed(max(seq for seq, _ in batch))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._metrics_lock:
+            self._metrics['committed'] += len(batch)
+            self._metrics['batches'] += 1
+            self._metrics['last_batch_size'] = len(batch)
+            self._metrics['last_flush_ms'] = round(elapsed_ms, 2)
+            self._metrics['max_flush_ms'] = round(max(self._metrics['max_flush_ms'], elapsed_ms), 2)
+            self._metrics['total_flush_ms'] += elapsed_ms
+
+    def _commit_individually(self, batch):
+        """
+        逐筆寫入重試後仍失敗的批次，找出導致失敗的提交並移入死信文件，
+        其餘照常寫入；之後檢查點越過整個批次
+        """
+        committed = dead_lettered = 0
+        for seq, submission in batch:
+            with self.app.app_context():
+                try:
+                    # 與重放相同跳過已存在的session，批次中途的失敗不會留下部分數據
+                    _persist_and_commit([submission], skip_existing=True)
+                    committed += 1
+                except Exception as e:
+                    db.session.rollback()
+                    self.journal.dead_letter(seq, submission, str(e))
+                    dead_lettered += 1
+                    print(f"提交 {submission['session_id']} 無法寫入，已移入死信文件: {str(e)}")
+        self.journal.mark_committed(max(seq for seq, _ in batch))
+
+        with self._metrics_lock:
+            self._metrics['committed'] += committed
+            self._metrics['dead_lettered'] += dead_lettered
+            self._metrics['failed_batches'] += 1
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            # 寫入失敗時按指數退避重試該批次，數據仍在日誌中
+            attempt = 0
+            while True:
+                try:
+                    self._flush(batch)
+                    break
+                except Exception as e:
+                    attempt += 1
+                    with self._metrics_lock:
+                        self._metrics['errors'] += 1
+                    if attempt >= self.max_retries:
+                        print(f"批量寫入提交失敗 {attempt} 次，改為逐筆寫入: {str(e)}")
+                        self._commit_individually(batch)
+                        break
+                    delay = min(self.retry_backoff * 2 ** (attempt - 1), 30)
+                    print(f"批量寫入提交失敗，{delay:.1f}秒後重試: {str(e)}")
+                    # 停止時不再重試並立即結束線程：之後的批次若寫入成功，檢查點會越過這一批，
+                    # 因此未寫入的批次及隊列中其餘的提交都留在日誌中，下次啟動時重放
+                    if self._stop.wait(delay):
+                        return
+
+
+_writer = None
+
+
+def init_submission_ingest(app, journal_path, enabled):
+    """
+    啟動時調用：無論是否啟用寫後模式都會先重放殘留的日誌，
+    啟用時再啟動後台寫入線程
+    """
+    global _writer
+
+    if not enabled and not os.path.exists(journal_path):
+        return None
+
+    journal = SubmissionJournal(journal_path)
+    writer = SubmissionWriter(
+        app,
+        journal,
+        batch_rows=app.config.get('SUBMIT_BATCH_ROWS', 100),
+        flush_interval=app.config.get('SUBMIT_FLUSH_INTERVAL', 0.2),
+        max_retries=app.config.get('SUBMIT_MAX_RETRIES', 5)
+    )
+    replayed = writer.replay()
+    if replayed:
+        print(f"✅ 已重放 {replayed} 筆未寫入的提交")
+
+    if not enabled:
+        journal.close()
+        return None
+
+    writer.start()
+    _writer = writer
+
+    import atexit
+    atexit.register(writer.stop)
+    return writer
+
+
+def get_submission_writer():
+    """返回寫後模式的寫入器，未啟用時為None"""
+    return _writer
@@ -0,0 +1,72 @@
+from ..models.quiz import ScoreSettings
+from .cache import VersionedSnapshot
+
+DEFAULT_LEVEL = '未分類'  # 沒有匹配的評分設定時
+DEFAULT_LEVEL_COLOR = '#6c757d'  # 默認灰色
+
+# 評分設定沒有顏色欄位，編譯時按等級名稱寫入每個區間，其他名稱使用默認灰色
+_LEVEL_COLORS = {
+    '攝影新手': '#4CAF50',
+    '進階攝影師': '#FF9800',
+    '高階攝影師': '#F44336',
+    '中階攝影師': '#FF9800'  # 向後兼容
+}
+
+UNMATCHED = (DEFAULT_LEVEL, DEFAULT_LEVEL_COLOR)
+
+# 分數範圍跨度不超過此值時建立 分數 → 等級 的密集查找表
+DENSE_SPAN_LIMIT = 4096
+
+
+class LevelTable:
+    """由啟用的評分設定編譯的分數等級查找表，每個區間帶有 (等級名稱, 顯示顏色)"""
+
+    def __init__(self, settings):
+        # 按ID順序保留區間，範圍重疊時與原查詢一樣以先建立的設定為準
+        self.intervals = tuple(
+            (s.min_score, s.max_score, (s.level_name, _LEVEL_COLORS.get(s.level_name, DEFAULT_LEVEL_COLOR)))
+            for s in settings
+        )
+        self.low = min((low for low, _, _ in self.intervals), default=0)
+        high = max((high for _, high, _ in self.intervals), default=-1)
+
+        self.dense = None
+        if high - self.low < DENSE_SPAN_LIMIT:
+            dense = [None] * max(high - self.low + 1, 0)
+            for low, high, level in self.intervals:
+                for score in range(low, high + 1):
+                    if dense[score - self.low] is None:
+                        dense[score - self.low] = level
+            self.dense = tuple(dense)
+
+    def lookup(self, score):
+        """返回 (等級名稱, 顯示顏色)"""
+        if self.dense is not None:
+            index = score - self.low
+            if 0 <= index < len(self.dense):
+                return self.dense[index] or UNMATCHED
+            return UNMATCHED
+
+        for low, high, level in self.intervals:
+            if low <= score <= high:
+                return level
+        return UNMATCHED
+
+    def level_for(self, score):
+        return self.lookup(score)[0]
+
+
+def _load_level_table():
+    return LevelTable(ScoreSettings.query.filter(ScoreSettings.is_active == True).order_by(ScoreSettings.id).all())
+
+
+_level_table = VersionedSnapshot(_load_level_table)
+
+
+def get_level_table():
+    return _level_table.get()
+
+
+def invalidate_level_table():
+    """評分設定新增、修改或刪除後調用"""
+    _level_table.invalidate()
@@ -0,0 +1,36 @@
+"""
+單進程部署檢查
+題庫、等級表、課程目錄及統計結果等緩存只在本進程內失效，寫後日誌及導出任務也只屬於一個進程；
+多個工作進程（如 gunicorn --workers 2）各自持有緩存，一個進程處理的提交或設定變更不會使其他進程的緩存失效
+啟動時以文件鎖確保同一數據庫只有一個應用進程；以 --preload 載入後fork出的進程處理請求時返回錯誤
+"""
+
+import fcntl
+import os
+
+_lock_file = None
+_owner_pid = None
+
+
+def acquire_process_lock(lock_path):
+    """啟動時調用：取得數據庫旁的獨佔文件鎖，已有其他應用進程使用同一數據庫時拋出RuntimeError"""
+    global _lock_file, _owner_pid
+
+    lock_file = open(lock_path, 'a+', encoding='utf-8')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(f'另一個應用進程正在使用此數據庫（{lock_path}），請以單進程方式部署（見Procfile）')
+
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _lock_file = lock_file
+    _owner_pid = os.getpid()
+
+
+def owns_process_lock():
+    """目前進程是否為取得文件鎖的應用進程"""
+    return _owner_pid is not None and _owner_pid == os.getpid()
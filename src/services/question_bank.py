@@ -0,0 +1,73 @@
+from flask import current_app
+
+from ..models.quiz import Question
+from .cache import VersionedSnapshot
+from .http_cache import CachedPayload
+from .scoring import ScoringPlan
+
+
+class QuestionKey:
+    """單一問題的唯讀快照（題號、題型、選項及答案）"""
+
+    __slots__ = ('id', 'content', 'question_type', 'order', 'options', 'correct_answer', 'correct_set')
+
+    def __init__(self, question):
+        self.id = question.id
+        self.content = question.content
+        self.question_type = question.question_type
+        self.order = question.order
+        self.options = tuple(question.options or [])
+        self.correct_answer = question.correct_answer
+        # 多選題答案預先轉換為frozenset，評分時無需重複建立集合
+        if isinstance(question.correct_answer, list):
+            self.correct_set = frozenset(question.correct_answer)
+        else:
+            self.correct_set = None
+
+
+class QuestionBank:
+    """題庫快照，按題目順序排列並可按ID查找，附帶由同一版本編譯的評分計劃"""
+
+    def __init__(self, questions):
+        self.questions = tuple(QuestionKey(q) for q in questions)
+        self.by_id = {q.id: q for q in self.questions}
+        self.scoring_plan = ScoringPlan(self.questions)
+        self._public_payload = None
+
+    def public_payload(self):
+        """/api/questions 的響應內容（不含正確答案），同一版本題庫只序列化及壓縮一次"""
+        if self._public_payload is None:
+            response = current_app.json.response([{
+                'id': q.id,
+                'content': q.content,
+                'question_type': q.question_type,
+                'order': q.order,
+                'options': list(q.options)
+            } for q in self.questions])
+            self._public_payload = CachedPayload(response.get_data(), response.mimetype)
+        return self._public_payload
+
+    def get(self, question_id):
+        try:
+            return self.by_id.get(int(question_id))
+        except (TypeError, ValueError):
+            return None
+
+
+def _load_question_bank():
+    return QuestionBank(Question.query.order_by(Question.order).all())
+
+
+# 快照只在處理題目變更的進程內失效：多個工作進程會以舊答案評分，
+# 因此應用須以單進程方式部署（啟動時由 process_guard 檢查）
+_question_bank = VersionedSnapshot(_load_question_bank)
+
+
+def get_question_bank():
+    """獲取題庫快照，評分時不再逐題查詢數據庫"""
+    return _question_bank.get()
+
+
+def invalidate_question_bank():
+    """題目新增、修改、刪除或排序後調用，下次讀取時重新載入（只影響本進程）"""
+    _question_bank.invalidate()
@@ -0,0 +1,162 @@
+"""
+原始回應導出
+按id keyset分頁分批讀取，每批生成一段CSV或NDJSON文本後即結束讀交易，不在導出期間長時間佔用數據庫鎖；
+內存佔用只取決於批大小，與導出的總行數無關
+"""
+
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import type_coerce
+
+from ..models.quiz import Response, SessionSummary, db
+from .question_bank import get_question_bank
+from .session_summaries import SESSION_CHUNK_SIZE
+from .stats import date_range_filters
+
+RESPONSE_CHUNK_SIZE = 5000
+
+# 格式: 響應的MIME類型
+RAW_EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8'
+}
+
+# 每行一條回應或一次提交
+ROWS_PER_RESPONSE = 'response'
+ROWS_PER_SESSION = 'session'
+
+# 答案按數據庫中的JSON文本原樣輸出，不經過反序列化再序列化
+_answer_text = type_coerce(Response.answer, db.Text)
+
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _keyset_batches(query, id_column, chunk_size):
+    """按id遞增分批讀取；每批讀取後關閉會話，結束讀交易並歸還連接"""
+    last_id = 0
+    while True:
+        rows = query.filter(id_column > last_id).order_by(id_column).limit(chunk_size).all()
+        db.session.close()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def _response_records(start, end, chunk_size):
+    query = db.session.query(
+        Response.id, Response.session_id, Response.question_id, _answer_text, Response.is_correct, Response.created_at
+    ).filter(*date_range_filters(start, end))
+    for rows in _keyset_batches(query, Response.id, chunk_size):
+        yield [{
+            'id': row_id,
+            'session_id': session_id,
+            'question_id': question_id,
+            'answer': answer,
+            'is_correct': is_correct,
+            'created_at': created_at.isoformat() if created_at else None
+        } for row_id, session_id, question_id, answer, is_correct, created_at in rows]
+
+
+def _session_records(start, end, chunk_size):
+    """按提交時間篩選提交匯總，每批再以session_id讀取這些提交的回應"""
+    query = db.session.query(
+        SessionSummary.id, SessionSummary.session_id, SessionSummary.score, SessionSummary.max_score,
+        SessionSummary.level, SessionSummary.interests, SessionSummary.created_at
+    ).filter(*date_range_filters(start, end, column=SessionSummary.created_at))
+    for rows in _keyset_batches(query, SessionSummary.id, chunk_size):
+        answers = {}
+        responses = db.session.query(Response.session_id, Response.question_id, _answer_text).filter(
+            Response.session_id.in_([row[1] for row in rows])
+        )
+        for session_id, question_id, answer in responses:
+            answers.setdefault(session_id, {})[question_id] = answer
+        db.session.close()
+
+        yield [{
+            'session_id': session_id,
+            'created_at': created_at.isoformat() if created_at else None,
+            'score': score,
+            'max_score': max_score,
+            'level': level,
+            'interests': interests or [],
+            'answers': answers.get(session_id, {})
+        } for _, session_id, score, max_score, level, interests, created_at in rows]
+
+
+def _ndjson_line(record):
+    # 答案已是JSON文本，直接嵌入，其他字段逐個序列化
+    fields = [f'"{key}":{_json(value)}' for key, value in record.items() if key not in ('answer', 'answers')]
+    if 'answers' in record:
+        answers = ','.join(f'"{question_id}":{answer}' for question_id, answer in record['answers'].items())
+        fields.append(f'"answers":{{{answers}}}')
+    else:
+        fields.append(f'"answer":{record["answer"]}')
+    return '{' + ','.join(fields) + '}\n'
+
+
+def _csv_columns(rows):
+    if rows == ROWS_PER_SESSION:
+        questions = get_question_bank().questions
+        header = ['session_id', 'created_at', 'score', 'max_score', 'level', 'interests'] + [f'Q{q.order}' for q in questions]
+        question_ids = [q.id for q in questions]
+
+        def values(record):
+            answers = record['answers']
+            return [
+                record['session_id'], record['created_at'], record['score'], record['max_score'],
+                record['level'], _json(record['interests'])
+            ] + [answers.get(question_id, '') for question_id in question_ids]
+    else:
+        header = ['id', 'session_id', 'question_id', 'answer', 'is_correct', 'created_at']
+
+        def values(record):
+            is_correct = record['is_correct']
+            return [
+                record['id'], record['session_id'], record['question_id'], record['answer'],
+                '' if is_correct is None else int(is_correct), record['created_at']
+            ]
+    return header, values
+
+
+def iter_raw_export(export_format, rows=ROWS_PER_RESPONSE, start=None, end=None, chunk_size=None):
+    """逐批生成導出文本（每批一段字符串）"""
+    if rows == ROWS_PER_SESSION:
+        batches = _session_records(start, end, chunk_size or SESSION_CHUNK_SIZE)
+    else:
+        batches = _response_records(start, end, chunk_size or RESPONSE_CHUNK_SIZE)
+
+    if export_format == 'ndjson':
+        for records in batches:
+            yield ''.join(_ndjson_line(record) for record in records)
+        return
+
+    header, values = _csv_columns(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # UTF-8 BOM使Excel正確識別中文
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    yield buffer.getvalue()
+    for records in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(values(record) for record in records)
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """將文本分塊以gzip格式逐塊壓縮（單個gzip流）"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
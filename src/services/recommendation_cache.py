@@ -0,0 +1,41 @@
+import threading
+
+from .cache import LRUCache
+
+# 推薦結果只取決於（等級、按點選順序的興趣、開啟課程目錄、推薦設定），按前兩者緩存，
+# 後兩者或評分設定變更時整體失效
+_recommendations = LRUCache(max_entries=512)
+_generation_lock = threading.Lock()
+_generation = 0
+
+
+def recommendation_cache_key(level, interests):
+    """
+    緩存鍵包含當前世代號：計算期間若發生失效，結果會以舊世代號寫入而不會再被命中
+    調用順序須為先取鍵、再讀取課程目錄及設定
+    """
+    # 興趣順序決定課程配對的先後，不可改為集合
+    return (_generation, level, tuple(interests))
+
+
+def get_cached_recommendations(key):
+    courses = _recommendations.get(key)
+    if courses is None:
+        return None
+    return [dict(course) for course in courses]
+
+
+def store_recommendations(key, courses):
+    _recommendations.put(key, tuple(dict(course) for course in courses))
+
+
+def invalidate_recommendations():
+    """課程、評分設定或推薦設定變更後調用（須在相關快照失效之後）"""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        _recommendations.clear()
+
+
+def recommendation_cache_stats():
+    return _recommendations.stats()
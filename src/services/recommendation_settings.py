@@ -0,0 +1,33 @@
+from ..models.quiz import RecommendationSettings
+from .cache import VersionedSnapshot
+
+# 沒有啟用的推薦設定時使用
+DEFAULT_RECOMMENDATION_SETTING = {
+    'min_courses': 3,
+    'max_courses': 8,
+    'setting_name': 'default'
+}
+
+
+def _load_active_recommendation_setting():
+    active_setting = RecommendationSettings.query.filter_by(is_active=True).order_by(RecommendationSettings.id).first()
+    if not active_setting:
+        return DEFAULT_RECOMMENDATION_SETTING
+    return {
+        'min_courses': active_setting.min_courses,
+        'max_courses': active_setting.max_courses,
+        'setting_name': active_setting.setting_name
+    }
+
+
+_active_setting = VersionedSnapshot(_load_active_recommendation_setting)
+
+
+def get_active_recommendation_snapshot():
+    """當前啟用的推薦設定快照（唯讀，請勿修改返回的字典）"""
+    return _active_setting.get()
+
+
+def invalidate_active_recommendation_setting():
+    """推薦設定新增、修改、刪除或啟用後調用"""
+    _active_setting.invalidate()
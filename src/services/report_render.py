@@ -0,0 +1,277 @@
+"""
+統計報告渲染
+只使用報告數據集（ReportDataset），不訪問數據庫，可在後台進程中執行
+"""
+
+import os
+
+# 格式: (擴展名, MIME類型)
+EXPORT_FORMATS = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'powerpoint': ('pptx', 'application/vnd.openxmlformats-officedocument.presentationml.presentation')
+}
+
+
+def render_excel(report, file):
+    """將報告寫入Excel文件（路徑或文件物件）"""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    # 創建只寫模式的Excel工作簿：行寫入後即序列化，不在內存中保留儲存格物件
+    wb = openpyxl.Workbook(write_only=True)
+
+    # 總覽工作表
+    ws_summary = wb.create_sheet("統計總覽")
+
+    # 設置標題樣式
+    title_font = Font(size=16, bold=True)
+    header_font = Font(size=12, bold=True)
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    total_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+    center = Alignment(horizontal='center')
+
+    def styled(ws, value, font=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(ws, value=value)
+        if font:
+            cell.font = font
+        if fill:
+            cell.fill = fill
+        if alignment:
+            cell.alignment = alignment
+        return cell
+
+    # 總覽包含沒有評分題回答的用戶
+    score_distribution = report.score_distribution(scored_only=False)
+    total_responses = report.total_responses
+
+    # 寫入總覽數據
+    ws_summary.append([styled(ws_summary, "攝影問卷系統統計報告", font=title_font)])
+    ws_summary.append([])
+    ws_summary.append(["統計期間：", report.period])
+    ws_summary.append(["總回應數：", total_responses])
+    ws_summary.append(["問題總數：", report.total_questions])
+    ws_summary.append(["平均分數：", f"{report.average_score(scored_only=False):.1f}"])
+    ws_summary.append([])
+
+    # 新增：參與者分數統計
+    ws_summary.append([styled(ws_summary, "參與者分數分布統計", font=header_font)])
+
+    # 寫入分數分布統計（表頭）
+    ws_summary.append([
+        styled(ws_summary, header, font=header_font, fill=header_fill, alignment=center)
+        for header in ("分數", "人數", "百分比")
+    ])
+
+    for score in sorted(score_distribution.keys()):
+        count = score_distribution[score]
+        percentage = (count / total_responses * 100) if total_responses > 0 else 0
+        ws_summary.append([
+            styled(ws_summary, value, alignment=center)
+            for value in (f"{score}分", count, f"{percentage:.1f}%")
+        ])
+
+    # 添加總計行
+    ws_summary.append([
+        styled(ws_summary, value, font=header_font, fill=total_fill, alignment=center)
+        for value in ("總計", total_responses, "100.0%")
+    ])
+
+    # 詳細統計工作表
+    ws_detail = wb.create_sheet("詳細統計")
+
+    # 設置表頭
+    headers = ['問題編號', '問題內容', '問題類型', '總回答數', '正確答案數', '正確率(%)', '選項1', '選項1人數', '選項1比例(%)', '選項2', '選項2人數', '選項2比例(%)', '選項3', '選項3人數', '選項3比例(%)', '選項4', '選項4人數', '選項4比例(%)']
+
+    # 填入問題統計數據
+    detail_rows = []
+    for question in report.questions:
+        values = [
+            question.order,
+            question.content,
+            '單選題' if question.question_type == 'single' else '多選題',
+            question.total_answers,
+            question.correct_answers,
+            f"{question.correct_rate:.1f}"
+        ]
+
+        # 選項統計
+        for i, option in enumerate(question.options[:4]):  # 最多4個選項
+            values.extend([option, question.option_counts[i], f"{question.option_percentage(i):.1f}"])
+
+        detail_rows.append(values + [None] * (len(headers) - len(values)))
+
+    # 調整列寬（只寫模式須在寫入行之前設定）
+    for index, header in enumerate(headers):
+        max_length = max(len(str(values[index])) for values in [headers] + detail_rows)
+        ws_detail.column_dimensions[get_column_letter(index + 1)].width = min(max_length + 2, 50)
+
+    ws_detail.append([
+        styled(ws_detail, header, font=header_font, fill=header_fill, alignment=center) for header in headers
+    ])
+    for values in detail_rows:
+        ws_detail.append(values)
+
+    wb.save(file)
+
+
+def _add_column_chart(slide, categories, values, title, x_title, y_title, color, number_format, maximum=None):
+    """在幻燈片上添加原生柱狀圖（可在PowerPoint中直接編輯數據）"""
+    from pptx.chart.data import CategoryChartData
+    from pptx.dml.color import RGBColor
+    from pptx.enum.chart import XL_CHART_TYPE
+    from pptx.util import Inches, Pt
+
+    chart_data = CategoryChartData(number_format=number_format)
+    chart_data.categories = categories
+    chart_data.add_series(y_title, values)
+
+    chart = slide.shapes.add_chart(
+        XL_CHART_TYPE.COLUMN_CLUSTERED, Inches(1), Inches(1.5), Inches(8), Inches(5), chart_data
+    ).chart
+    chart.has_legend = False
+    chart.font.size = Pt(12)
+    chart.has_title = True
+    chart.chart_title.text_frame.text = title
+    chart.chart_title.text_frame.paragraphs[0].font.size = Pt(16)
+    chart.chart_title.text_frame.paragraphs[0].font.bold = True
+
+    chart.category_axis.axis_title.text_frame.text = x_title
+    value_axis = chart.value_axis
+    value_axis.axis_title.text_frame.text = y_title
+    value_axis.minimum_scale = 0
+    if maximum is not None:
+        value_axis.maximum_scale = maximum
+    value_axis.has_major_gridlines = True
+    value_axis.major_gridlines.format.line.color.rgb = RGBColor(0xD9, 0xD9, 0xD9)
+
+    series = chart.plots[0].series[0]
+    series.format.fill.solid()
+    series.format.fill.fore_color.rgb = RGBColor.from_string(color)
+    return chart
+
+
+def render_powerpoint(report, file):
+    """將報告寫入PowerPoint文件（路徑或文件物件）；圖表為原生圖表物件"""
+    from pptx import Presentation
+    from pptx.dml.color import RGBColor
+    from pptx.util import Inches, Pt
+    from pptx.enum.chart import XL_LABEL_POSITION
+    from pptx.enum.text import PP_ALIGN
+
+    # 創建PowerPoint演示文稿
+    prs = Presentation()
+
+    # 第一張幻燈片：標題頁
+    slide_layout = prs.slide_layouts[0]  # 標題幻燈片
+    slide = prs.slides.add_slide(slide_layout)
+    title = slide.shapes.title
+    subtitle = slide.placeholders[1]
+
+    title.text = "攝影問卷系統統計報告"
+    subtitle.text = f"統計期間：{report.period}"
+
+    # 第二張幻燈片：總覽統計
+    slide_layout = prs.slide_layouts[1]  # 標題和內容
+    slide = prs.slides.add_slide(slide_layout)
+    title = slide.shapes.title
+    title.text = "統計總覽"
+
+    # 添加文本框
+    left = Inches(1)
+    top = Inches(2)
+    width = Inches(8)
+    height = Inches(4)
+
+    textbox = slide.shapes.add_textbox(left, top, width, height)
+    text_frame = textbox.text_frame
+
+    p = text_frame.paragraphs[0]
+    p.text = f"總回應數：{report.total_responses}"
+    p.font.size = Pt(24)
+
+    p = text_frame.add_paragraph()
+    p.text = f"問題總數：{report.total_questions}"
+    p.font.size = Pt(24)
+
+    p = text_frame.add_paragraph()
+    p.text = f"平均分數：{report.average_score(scored_only=False):.1f}"
+    p.font.size = Pt(24)
+
+    # 第三張幻燈片：正確率圖表
+    slide_layout = prs.slide_layouts[5]  # 空白幻燈片
+    slide = prs.slides.add_slide(slide_layout)
+
+    # 添加標題
+    title_shape = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1))
+    title_frame = title_shape.text_frame
+    title_para = title_frame.paragraphs[0]
+    title_para.text = "各題正確率統計"
+    title_para.font.size = Pt(28)
+    title_para.font.bold = True
+    title_para.alignment = PP_ALIGN.CENTER
+
+    # 創建正確率圖表（只統計技術問題）
+    technical_questions = [question for question in report.questions if question.is_technical]
+    question_numbers = [f"Q{question.order}" for question in technical_questions]
+    correct_rates = [question.correct_rate for question in technical_questions]
+
+    chart = _add_column_chart(
+        slide, question_numbers, correct_rates, '各題正確率統計', '問題編號', '正確率 (%)',
+        '4472C4', '0.0"%"', maximum=100
+    )
+
+    # 在柱狀圖上添加數值標籤
+    plot = chart.plots[0]
+    plot.has_data_labels = True
+    data_labels = plot.data_labels
+    data_labels.number_format = '0.0"%"'
+    data_labels.number_format_is_linked = False
+    data_labels.position = XL_LABEL_POSITION.OUTSIDE_END
+    data_labels.font.size = Pt(10)
+
+    # 第四張幻燈片：回應分布圖
+    slide_layout = prs.slide_layouts[5]  # 空白幻燈片
+    slide = prs.slides.add_slide(slide_layout)
+
+    # 添加標題
+    title_shape = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(1))
+    title_frame = title_shape.text_frame
+    title_para = title_frame.paragraphs[0]
+    title_para.text = "分數分布統計"
+    title_para.font.size = Pt(28)
+    title_para.font.bold = True
+    title_para.alignment = PP_ALIGN.CENTER
+
+    # 創建分數分布圖：每個分數一欄，沒有人的分數顯示為0
+    score_distribution = report.score_distribution(scored_only=False)
+    scores = list(range(0, max(score_distribution, default=0) + 1))
+
+    chart = _add_column_chart(
+        slide, [str(score) for score in scores], [score_distribution.get(score, 0) for score in scores],
+        '分數分布統計', '正確答題數', '人數', '70AD47', '0'
+    )
+    # 欄間無間隙，呈直方圖樣式
+    chart.plots[0].gap_width = 0
+    chart.plots[0].series[0].format.line.color.rgb = RGBColor(0, 0, 0)
+
+    prs.save(file)
+
+
+_RENDERERS = {
+    'excel': render_excel,
+    'powerpoint': render_powerpoint
+}
+
+
+def render_report(export_format, report, path):
+    """渲染報告並寫入path；在後台進程中執行，先寫入臨時文件再改名，讀取方不會看到寫了一半的文件"""
+    partial_path = f'{path}.part'
+    try:
+        _RENDERERS[export_format](report, partial_path)
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    return path
@@ -0,0 +1,155 @@
+"""
+報告數據集
+詳細統計、Excel及PowerPoint導出共用同一份按日期範圍匯總的數據：一次讀取時間桶匯總
+（approx時只讀日桶）即得到人數、每題回答數、答對數、選項計數及分數分布，
+結果按（日期範圍、數據版本）緩存，同一範圍只匯總一次
+數據集只含基本類型，可交給後台進程渲染
+"""
+
+from datetime import time
+
+from .question_bank import get_question_bank
+from .scoring import SCORED_MAX_ORDER
+from .stats import (
+    METRIC_ANSWERS, METRIC_CORRECT, METRIC_OPTION, METRIC_SCORE, QUESTION_METRICS, approx_range_counts, range_counts
+)
+from .stats_cache import cached_stats
+
+REPORT_METRICS = QUESTION_METRICS + (METRIC_SCORE,)
+
+
+class QuestionReport:
+    """
+    單題統計；非技術問題（不計分）的答對數固定為0
+    近似數據集中 *_bounds 為 (下界, 上界)，精確數據集中為None
+    """
+
+    __slots__ = (
+        'id', 'order', 'content', 'question_type', 'options', 'is_technical', 'total_answers', 'correct_answers',
+        'option_counts', 'total_answers_bounds', 'correct_answers_bounds', 'option_bounds'
+    )
+
+    def __init__(self, question, counts, bounds=None):
+        self.id = question.id
+        self.order = question.order
+        self.content = question.content
+        self.question_type = question.question_type
+        self.options = question.options
+        self.is_technical = question.order <= SCORED_MAX_ORDER
+        self.total_answers = counts.get((METRIC_ANSWERS, question.id, 0), 0)
+        self.correct_answers = counts.get((METRIC_CORRECT, question.id, 0), 0) if self.is_technical else 0
+        self.option_counts = [counts.get((METRIC_OPTION, question.id, i), 0) for i in range(len(question.options))]
+
+        self.total_answers_bounds = self.correct_answers_bounds = self.option_bounds = None
+        if bounds is not None:
+            self.total_answers_bounds = bounds.get((METRIC_ANSWERS, question.id, 0), (0, 0))
+            self.correct_answers_bounds = (
+                bounds.get((METRIC_CORRECT, question.id, 0), (0, 0)) if self.is_technical else (0, 0)
+            )
+            self.option_bounds = [bounds.get((METRIC_OPTION, question.id, i), (0, 0)) for i in range(len(question.options))]
+
+    @property
+    def correct_rate(self):
+        if not self.is_technical or self.total_answers == 0:
+            return 0
+        return self.correct_answers / self.total_answers * 100
+
+    def option_percentage(self, option_index):
+        return (self.option_counts[option_index] / self.total_answers * 100) if self.total_answers > 0 else 0
+
+
+class ReportDataset:
+    """
+    日期範圍內的報告數據；人數及分數按提交時間篩選（見 get_detailed_stats 的說明）
+    score_counts: {(分數, 是否有評分題回答): 人數}；近似數據集中為未取整的估計值，
+    另有 score_bounds 及 total_responses_bounds
+    """
+
+    __slots__ = ('start', 'end', 'approx', 'questions', 'score_counts', 'score_bounds', 'total_responses', 'total_responses_bounds')
+
+    def __init__(self, start, end, approx, questions, score_counts, score_bounds=None):
+        self.start = start
+        self.end = end
+        self.approx = approx
+        self.questions = questions
+        self.score_counts = score_counts
+        self.score_bounds = score_bounds
+        self.total_responses = round(sum(score_counts.values()))
+        self.total_responses_bounds = None
+        if score_bounds is not None:
+            self.total_responses_bounds = (
+                sum(lower for lower, _ in score_bounds.values()), sum(upper for _, upper in score_bounds.values())
+            )
+
+    @property
+    def period(self):
+        return f"{_format_date(self.start) or '開始'} 至 {_format_date(self.end) or '現在'}"
+
+    @property
+    def total_questions(self):
+        return len(self.questions)
+
+    def score_distribution(self, scored_only=True):
+        """{分數: 人數}；scored_only時只統計有評分題回答的用戶"""
+        distribution = {}
+        for (score, is_scored), count in self.score_counts.items():
+            if count and (is_scored or not scored_only):
+                distribution[score] = distribution.get(score, 0) + count
+        if self.approx:
+            return {score: round(count) for score, count in distribution.items()}
+        return distribution
+
+    def score_distribution_bounds(self, scored_only=True):
+        """近似數據集中各分數人數的 {分數: (下界, 上界)}"""
+        distribution = {}
+        for (score, is_scored), (lower, upper) in self.score_bounds.items():
+            if is_scored or not scored_only:
+                total_lower, total_upper = distribution.get(score, (0, 0))
+                distribution[score] = (total_lower + lower, total_upper + upper)
+        return distribution
+
+    def average_score(self, scored_only=True):
+        distribution = self.score_distribution(scored_only)
+        sessions = sum(distribution.values())
+        return sum(score * count for score, count in distribution.items()) / sessions if sessions else 0
+
+
+def _format_date(value):
+    if value is None:
+        return None
+    return value.date().isoformat() if value.time() == time.min else value.isoformat()
+
+
+def build_report_dataset(start=None, end=None, approx=False):
+    """
+    一次讀取所有報告指標並建立數據集
+    approx時只讀日桶：人數取估計值四捨五入，並記錄上下界
+    """
+    bounds = None
+    if approx:
+        estimates = approx_range_counts(start, end, REPORT_METRICS)
+        counts = {key: round(estimate) for key, (estimate, _, _) in estimates.items()}
+        bounds = {key: (lower, upper) for key, (_, lower, upper) in estimates.items()}
+    else:
+        counts = range_counts(start, end, REPORT_METRICS)
+
+    score_counts = {}
+    score_bounds = {} if approx else None
+    if approx:
+        # 分數分布先加總估計值再四捨五入，與逐項取整相比誤差較小
+        for (metric, score, is_scored), (estimate, lower, upper) in estimates.items():
+            if metric == METRIC_SCORE:
+                score_counts[(score, is_scored)] = estimate
+                score_bounds[(score, is_scored)] = (lower, upper)
+    else:
+        for (metric, score, is_scored), count in counts.items():
+            if metric == METRIC_SCORE:
+                score_counts[(score, is_scored)] = count
+
+    questions = [QuestionReport(question, counts, bounds) for question in get_question_bank().questions]
+    return ReportDataset(start, end, approx, questions, score_counts, score_bounds)
+
+
+def get_report_dataset(start=None, end=None, approx=False):
+    """返回日期範圍的報告數據集；按（日期範圍、數據版本）緩存，並發的相同請求只匯總一次"""
+    return cached_stats('report_dataset', (start, end, approx), lambda: build_report_dataset(start, end, approx))
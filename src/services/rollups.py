@@ -0,0 +1,98 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func
+
+from ..models.quiz import Response, SessionSummary, StatsRollup, db
+from .answer_masks import selected_options
+from .question_bank import get_question_bank
+from .stats import (
+    DAY, DAY_DELTA, HOUR, METRIC_ANSWERS, METRIC_CORRECT, METRIC_OPTION, METRIC_SCORE,
+    floor_day, floor_hour, raw_question_counts, raw_score_counts, span_filters
+)
+from .stats_counters import upsert_increments
+
+KEY_COLUMNS = ['granularity', 'bucket_start', 'metric', 'key1', 'key2']
+
+
+def _hour_of(column):
+    """SQL中的小時桶（與 floor_hour 一致的 'YYYY-MM-DD HH:00:00'）"""
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+
+def _rollup_rows(hourly_counts):
+    """由小時桶的計數 {(小時, metric, key1, key2): 值} 生成小時及日兩種粒度的匯總行"""
+    daily_counts = Counter()
+    for (hour, metric, key1, key2), value in hourly_counts.items():
+        daily_counts[(floor_day(hour), metric, key1, key2)] += value
+
+    return [{
+        'granularity': granularity,
+        'bucket_start': bucket_start,
+        'metric': metric,
+        'key1': key1,
+        'key2': key2,
+        'value': value
+    } for granularity, counts in ((HOUR, hourly_counts), (DAY, daily_counts))
+        for (bucket_start, metric, key1, key2), value in counts.items() if value]
+
+
+def apply_rollups(submissions):
+    """提交寫入時在同一交易中累加所屬小時及日的匯總"""
+    question_bank = get_question_bank()
+    counts = Counter()
+    for submission in submissions:
+        if not submission['responses']:
+            continue
+        hour = floor_hour(submission['created_at'])
+        counts[(hour, METRIC_SCORE, submission['score'], 1 if submission['max_score'] > 0 else 0)] += 1
+        for question_id, answer, is_correct in submission['responses']:
+            counts[(hour, METRIC_ANSWERS, question_id, 0)] += 1
+            if is_correct:
+                counts[(hour, METRIC_CORRECT, question_id, 0)] += 1
+            question = question_bank.get(question_id)
+            if question:
+                for option_index in selected_options(question.question_type, answer):
+                    counts[(hour, METRIC_OPTION, question_id, option_index)] += 1
+
+    upsert_increments(StatsRollup, KEY_COLUMNS, _rollup_rows(counts), ['value'])
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    按原始數據重新計算與 [start, end] 相交的各日（及其中各小時）的匯總，不指定時重建全部
+    刪除回應或題型改變後調用（不負責commit）
+    """
+    day_low = floor_day(start) if start else None
+    day_high = floor_day(end) + DAY_DELTA if end else None
+
+    StatsRollup.query.filter(
+        *span_filters(StatsRollup.bucket_start, day_low, day_high)
+    ).delete(synchronize_session=False)
+
+    counts = raw_question_counts(
+        span_filters(Response.created_at, day_low, day_high), bucket=_hour_of(Response.created_at)
+    )
+    counts.update(raw_score_counts(
+        span_filters(SessionSummary.created_at, day_low, day_high), bucket=_hour_of(SessionSummary.created_at)
+    ))
+
+    hourly_counts = Counter({
+        (datetime.fromisoformat(hour), metric, key1, key2): value
+        for (hour, metric, key1, key2), value in counts.items() if hour is not None
+    })
+    rows = _rollup_rows(hourly_counts)
+    if rows:
+        db.session.execute(StatsRollup.__table__.insert(), rows)
+
+
+def clear_rollups():
+    StatsRollup.query.delete()
+
+
+def ensure_rollups():
+    """啟動時調用：匯總表為空而已有回應時（升級後首次啟動）按原始數據建立"""
+    if StatsRollup.query.first() is None and Response.query.first() is not None:
+        rebuild_rollups()
+        db.session.commit()
+        print("✅ 已建立按小時及按日的統計匯總")
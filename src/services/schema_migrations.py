@@ -0,0 +1,60 @@
+"""
+輕量的數據庫結構遷移
+db.create_all() 只建立缺少的表，不會修改已部署的 app.db 中現有的表；
+已套用的版本記錄在SQLite的 PRAGMA user_version 中，啟動時依次套用較新的遷移
+"""
+
+from sqlalchemy import text
+
+from ..models.quiz import db
+from .answer_masks import ANSWER_MASK_SQL
+
+
+def _add_column(table, column, definition):
+    """SQLite的ADD COLUMN不支持IF NOT EXISTS；新建的數據庫已由 create_all 建立該列"""
+    def step():
+        columns = {row[1] for row in db.session.execute(text(f'PRAGMA table_info({table})'))}
+        if column not in columns:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+    return step
+
+
+# (版本號, 說明, 步驟)，步驟為SQL語句或可調用物件，只可在末尾追加，已發佈的遷移不可修改
+MIGRATIONS = [
+    (1, '為Response表建立統計、導出及清除數據所用的索引', [
+        'CREATE INDEX IF NOT EXISTS ix_response_session_id ON response (session_id)',
+        'CREATE INDEX IF NOT EXISTS ix_response_question_id ON response (question_id)',
+        'CREATE INDEX IF NOT EXISTS ix_response_created_at_question_id ON response (created_at, question_id)',
+    ]),
+    (2, '為Response表增加答案位掩碼列並按現有答案回填', [
+        _add_column('response', 'answer_mask', 'INTEGER'),
+        f'UPDATE response SET answer_mask = {ANSWER_MASK_SQL}',
+    ]),
+]
+
+
+def get_schema_version():
+    return db.session.execute(text('PRAGMA user_version')).scalar()
+
+
+def run_migrations():
+    """在 db.create_all() 之後調用，返回套用的遷移數量"""
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+
+    current = get_schema_version()
+    applied = 0
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            if callable(statement):
+                statement()
+            else:
+                db.session.execute(text(statement))
+        # PRAGMA不支持綁定參數；版本號來自上方常量
+        db.session.execute(text(f'PRAGMA user_version = {int(version)}'))
+        db.session.commit()
+        print(f"✅ 已套用數據庫遷移 {version}: {description}")
+        applied += 1
+    return applied
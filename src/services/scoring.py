@@ -0,0 +1,93 @@
+SCORED_MAX_ORDER = 17  # 前17題為技術問題，計入分數
+INTEREST_ORDER = 18  # 第18題為興趣選擇，用於課程推薦
+
+# 評分計劃中的題目類別
+UNSCORED = 0
+SCORED_SINGLE = 1
+SCORED_MULTIPLE = 2
+INTEREST = 3
+
+
+def interest_options(options, answer):
+    """
+    興趣題所選的選項文字，保持點選順序（推薦按此順序配對課程）；
+    重複的選項照舊保留，推薦時該興趣會再配對一輪課程
+    """
+    return [options[i] for i in answer if isinstance(i, int) and 0 <= i < len(options)]
+
+
+class ScoreResult:
+    """單次提交的評分結果"""
+
+    __slots__ = ('score', 'max_score', 'responses', 'interests')
+
+    def __init__(self):
+        self.score = 0
+        self.max_score = 0
+        self.responses = []  # [(question_id, answer, is_correct)]，非評分題目is_correct為None
+        self.interests = []  # 第18題所選的興趣選項文字（按點選順序）
+
+    @property
+    def percentage(self):
+        return (self.score / self.max_score * 100) if self.max_score > 0 else 0
+
+
+class ScoringPlan:
+    """
+    由題庫快照編譯的評分計劃
+    每題預先歸類為評分題（單選/多選）、興趣題或非評分題，提交時只需單次遍歷答案
+    """
+
+    def __init__(self, questions):
+        self._entries = {}
+        for question in questions:
+            if question.order <= SCORED_MAX_ORDER:
+                if question.question_type == 'single':
+                    entry = (SCORED_SINGLE, question.correct_answer)
+                else:
+                    # 多選題以frozenset比對；未知題型沒有答案集合，只計入滿分
+                    entry = (SCORED_MULTIPLE, question.correct_set if question.question_type == 'multiple' else None)
+            elif question.order == INTEREST_ORDER:
+                entry = (INTEREST, question.options)
+            else:
+                entry = (UNSCORED, None)
+            self._entries[question.id] = entry
+
+    def score(self, answers):
+        """單次遍歷答案列表，返回分數、滿分、每題對錯及所選興趣"""
+        result = ScoreResult()
+        entries = self._entries
+
+        for answer in answers:
+            if not answer or 'question_id' not in answer or 'answer' not in answer:
+                continue
+
+            try:
+                question_id = int(answer['question_id'])
+            except (TypeError, ValueError):
+                continue
+            entry = entries.get(question_id)
+            if entry is None:
+                continue
+
+            kind, key = entry
+            value = answer['answer']
+
+            if kind == SCORED_SINGLE:
+                is_correct = value == key
+            elif kind == SCORED_MULTIPLE:
+                is_correct = isinstance(value, list) and key is not None and frozenset(value) == key
+            else:
+                is_correct = None
+                if kind == INTEREST and isinstance(value, list):
+                    result.interests.extend(interest_options(key, value))
+
+            if is_correct is not None:
+                result.max_score += 1
+                if is_correct:
+                    result.score += 1
+
+            result.responses.append((question_id, value, is_correct))
+
+        return result
+
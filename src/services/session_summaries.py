@@ -0,0 +1,125 @@
+from sqlalchemy import bindparam, func
+
+from ..models.quiz import Response, SessionSummary, db
+from .level_table import get_level_table
+from .question_bank import get_question_bank
+from .scoring import INTEREST_ORDER, interest_options
+
+# SQLite單條語句的參數上限較低，按session批量處理時分段查詢
+SESSION_CHUNK_SIZE = 500
+
+_score = func.sum(db.case((Response.is_correct, 1), else_=0))
+_max_score = func.count(Response.is_correct)
+
+
+def summary_rows(submissions):
+    """提交記錄對應的匯總行（沒有任何回應的提交不寫入）"""
+    return [{
+        'session_id': submission['session_id'],
+        'score': submission['score'],
+        'max_score': submission['max_score'],
+        'level': submission.get('level'),
+        'interests': submission.get('interests', []),
+        'created_at': submission['created_at']
+    } for submission in submissions if submission['responses']]
+
+
+def _chunks(items, size=SESSION_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _interests_by_session(session_ids):
+    """按第18題的回答還原所選興趣（與評分計劃相同：保持點選順序及重複的選項）"""
+    interest_question = next((q for q in get_question_bank().questions if q.order == INTEREST_ORDER), None)
+    interests = {}
+    if interest_question is None:
+        return interests
+
+    # 位掩碼不保留點選順序，須讀取答案JSON
+    for chunk in _chunks(session_ids):
+        rows = db.session.query(Response.session_id, Response.answer).filter(
+            Response.question_id == interest_question.id,
+            Response.session_id.in_(chunk)
+        )
+        for session_id, answer in rows:
+            selected = interest_options(interest_question.options, answer) if isinstance(answer, list) else []
+            interests.setdefault(session_id, []).extend(selected)
+    return interests
+
+
+def backfill_session_summaries():
+    """
+    為尚未有匯總的session按現有回應補寫匯總（等級按目前的評分設定計算），返回補寫數量，不負責commit
+    提交時間取最早的回應時間：日期範圍統計按此時間計入該提交，回應跨越範圍邊界的舊提交不再在兩側都被計數
+    """
+    missing = db.session.query(
+        Response.session_id, _score, _max_score, func.min(Response.created_at)
+    ).filter(
+        ~Response.session_id.in_(db.session.query(SessionSummary.session_id))
+    ).group_by(Response.session_id).all()
+    if not missing:
+        return 0
+
+    level_table = get_level_table()
+    interests = _interests_by_session(row[0] for row in missing)
+    db.session.execute(SessionSummary.__table__.insert(), [{
+        'session_id': session_id,
+        'score': score,
+        'max_score': max_score,
+        'level': level_table.level_for(score),
+        'interests': interests.get(session_id, []),
+        'created_at': created_at
+    } for session_id, score, max_score, created_at in missing])
+    return len(missing)
+
+
+def resync_session_summaries(session_ids=None):
+    """
+    刪除回應後調用（不負責commit）：按剩餘回應重新計算分數，回應已全部刪除的session移除匯總
+    session_ids為None時處理全部session
+    """
+    if session_ids is None:
+        groups = [db.session.query(Response.session_id, _score, _max_score).group_by(Response.session_id).all()]
+    else:
+        groups = [db.session.query(Response.session_id, _score, _max_score).filter(
+            Response.session_id.in_(chunk)
+        ).group_by(Response.session_id).all() for chunk in _chunks(session_ids)]
+
+    table = SessionSummary.__table__
+    update = table.update().where(table.c.session_id == bindparam('b_session_id')).values(
+        score=bindparam('b_score'), max_score=bindparam('b_max_score')
+    )
+    for rows in groups:
+        if rows:
+            db.session.execute(update, [
+                {'b_session_id': session_id, 'b_score': score, 'b_max_score': max_score}
+                for session_id, score, max_score in rows
+            ])
+
+    orphaned = SessionSummary.query.filter(
+        ~db.session.query(Response.id).filter(Response.session_id == SessionSummary.session_id).exists()
+    )
+    if session_ids is None:
+        orphaned.delete(synchronize_session=False)
+    else:
+        for chunk in _chunks(session_ids):
+            orphaned.filter(SessionSummary.session_id.in_(chunk)).delete(synchronize_session=False)
+
+
+def session_days(session_ids):
+    """這些session提交當日的零時（用於重建對應日期的時間桶匯總）"""
+    days = set()
+    for chunk in _chunks(session_ids):
+        rows = db.session.query(SessionSummary.created_at).filter(SessionSummary.session_id.in_(chunk))
+        days.update(created_at.replace(hour=0, minute=0, second=0, microsecond=0) for created_at, in rows)
+    return days
+
+
+def ensure_session_summaries():
+    """啟動時調用：匯總表為空而已有回應時（升級後首次啟動）回填"""
+    if SessionSummary.query.first() is None and Response.query.first() is not None:
+        count = backfill_session_summaries()
+        db.session.commit()
+        print(f"✅ 已回填 {count} 筆提交匯總")
@@ -0,0 +1,32 @@
+import mimetypes
+import os
+from datetime import datetime, timezone
+
+from .http_cache import CachedPayload
+
+
+class StaticAssetTable:
+    """
+    啟動時將靜態目錄內的文件載入內存，並預先計算gzip/brotli壓縮版本、ETag及Last-Modified
+    請求時不再訪問文件系統；更新靜態文件後需重啟應用
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._assets = {}
+        if folder and os.path.isdir(folder):
+            self._load()
+
+    def _load(self):
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                full_path = os.path.join(root, filename)
+                relative_path = os.path.relpath(full_path, self.folder).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                with open(full_path, 'rb') as f:
+                    body = f.read()
+                last_modified = datetime.fromtimestamp(int(os.path.getmtime(full_path)), tz=timezone.utc)
+                self._assets[relative_path] = CachedPayload(body, mimetype, last_modified)
+
+    def get(self, path):
+        return self._assets.get(path)
@@ -0,0 +1,341 @@
+"""
+日期範圍統計查詢
+完整的日及小時由預先匯總的時間桶（StatsRollup）加總，只有首尾不足一小時的部分掃描原始數據，
+因此查詢數月數據與查詢一天的耗時相近
+每位用戶只在提交時間所屬的時間桶計入一次，各桶的人數可直接相加，無需去重的基數估計
+近似模式只讀日桶，首尾不完整的兩日按時間比例估計並返回上下界
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from ..models.quiz import Response, SessionSummary, StatsRollup, db
+from .answer_masks import mask_options
+from .question_bank import get_question_bank
+
+# 時間桶粒度
+HOUR = 'hour'
+DAY = 'day'
+
+# 匯總指標：(metric, key1, key2)
+METRIC_SCORE = 'score'  # key1=分數，key2=是否有評分題回答（1/0），值為人數
+METRIC_ANSWERS = 'answers'  # key1=題目ID，值為回答數
+METRIC_CORRECT = 'correct'  # key1=題目ID，值為答對數
+METRIC_OPTION = 'option'  # key1=題目ID，key2=選項索引，值為選擇人數
+QUESTION_METRICS = (METRIC_ANSWERS, METRIC_CORRECT, METRIC_OPTION)
+
+HOUR_DELTA = timedelta(hours=1)
+DAY_DELTA = timedelta(days=1)
+
+
+def date_range_filters(start=None, end=None, column=Response.created_at):
+    """created_at 的日期篩選條件（兩端均包含）"""
+    filters = []
+    if start:
+        filters.append(column >= start)
+    if end:
+        filters.append(column <= end)
+    return filters
+
+
+def span_filters(column, low=None, high=None, high_inclusive=False):
+    """[low, high) 或 [low, high] 的篩選條件，None 表示不限"""
+    filters = []
+    if low is not None:
+        filters.append(column >= low)
+    if high is not None:
+        filters.append(column <= high if high_inclusive else column < high)
+    return filters
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _ceil(value, floor, delta):
+    floored = floor(value)
+    return floored if floored == value else floored + delta
+
+
+def plan_range(start=None, end=None):
+    """
+    將 [start, end] 拆分為完整的日桶區間、完整的小時桶區間及首尾不足一小時的原始數據區間
+    返回 (days, hours, raw)：days/hours 為 [(low, high)]（左閉右開），raw 為 [(low, high, high_inclusive)]
+    """
+    hour_low = _ceil(start, floor_hour, HOUR_DELTA) if start else None
+    # end 包含在範圍內，結束於 end 之後的小時不完整
+    hour_high = floor_hour(end + timedelta(microseconds=1)) if end else None
+    if hour_low is not None and hour_high is not None and hour_low >= hour_high:
+        return [], [], [(start, end, True)]
+
+    raw = []
+    if start and start < hour_low:
+        raw.append((start, hour_low, False))
+    if end and hour_high <= end:
+        raw.append((hour_high, end, True))
+
+    day_low = _ceil(hour_low, floor_day, DAY_DELTA) if hour_low is not None else None
+    day_high = floor_day(hour_high) if hour_high is not None else None
+    if day_low is not None and day_high is not None and day_low >= day_high:
+        return [], [(hour_low, hour_high)], raw
+
+    hours = []
+    if hour_low is not None and hour_low < day_low:
+        hours.append((hour_low, day_low))
+    if hour_high is not None and day_high < hour_high:
+        hours.append((day_high, hour_high))
+    return [(day_low, day_high)], hours, raw
+
+
+def _is_option_index(value):
+    # JSON中的數字及true均按數值比較（與Python的 == 語義一致），其他值不可能等於選項索引
+    return isinstance(value, (int, float)) and value == int(value)
+
+
+def raw_question_counts(filters, bucket=None):
+    """
+    以分組SQL統計原始回應，返回 Counter{(時間桶, metric, key1, key2): 計數}，不建立ORM物件
+    選項計數按答案位掩碼分組後在Python中按位展開；位掩碼為NULL（舊數據或無法編碼）的回應改為解析JSON：
+    單選題比較答案值，其他題型以 json_each 展開列表檢查成員（按目前題型）
+    bucket 為時間桶表達式，None 時不分桶
+    """
+    question_types = {q.id: q.question_type for q in get_question_bank().questions}
+    bucket_columns = [bucket.label('bucket')] if bucket is not None else []
+    # 以表達式分組，避免查詢計劃為省去排序而改用question_id索引全表掃描，放棄created_at範圍索引
+    question_key = (Response.question_id + 0).label('question_id')
+    counts = Counter()
+
+    # 每題總數、答對數及按位掩碼分組的計數（不同的選擇組合遠少於回應數）
+    rows = db.session.query(
+        *bucket_columns,
+        question_key,
+        Response.answer_mask,
+        func.count(),
+        func.sum(db.case((Response.is_correct, 1), else_=0))
+    ).filter(*filters).group_by(*bucket_columns, question_key, Response.answer_mask)
+
+    has_unmasked = False
+    mask_bits = {}
+    for row in rows:
+        row_bucket = row[0] if bucket_columns else None
+        question_id, mask, count, correct = row[-4:]
+        counts[(row_bucket, METRIC_ANSWERS, question_id, 0)] += count
+        if correct:
+            counts[(row_bucket, METRIC_CORRECT, question_id, 0)] += correct
+        if mask is None:
+            has_unmasked = True
+        elif question_id in question_types:
+            if mask not in mask_bits:
+                mask_bits[mask] = mask_options(mask)
+            for option_index in mask_bits[mask]:
+                counts[(row_bucket, METRIC_OPTION, question_id, option_index)] += count
+
+    if has_unmasked:
+        _count_unmasked_options(counts, question_types, filters, bucket_columns, question_key)
+    return counts
+
+
+def _count_unmasked_options(counts, question_types, filters, bucket_columns, question_key):
+    """解析JSON統計沒有位掩碼的回應的選項計數"""
+    unmasked = Response.answer_mask.is_(None)
+
+    # 非列表答案按值分組（列表答案歸入同一個NULL組）
+    answer_type = func.json_type(Response.answer)
+    scalar_value = db.case(
+        (answer_type.in_(('array', 'object')), None),
+        else_=func.json_extract(Response.answer, '$')
+    ).label('value')
+    rows = db.session.query(
+        *bucket_columns, question_key, scalar_value, func.count()
+    ).filter(unmasked, *filters).group_by(*bucket_columns, question_key, scalar_value)
+    for row in rows:
+        row_bucket = row[0] if bucket_columns else None
+        question_id, value, count = row[-3:]
+        if question_types.get(question_id) == 'single' and _is_option_index(value):
+            counts[(row_bucket, METRIC_OPTION, question_id, int(value))] += count
+
+    # 列表答案展開為元素，同一回答中的重複元素只計一次
+    element = func.json_each(Response.answer).table_valued('value')
+    rows = db.session.query(
+        *bucket_columns,
+        question_key,
+        element.c.value,
+        func.count(func.distinct(Response.id))
+    ).select_from(Response).join(element, db.true()).filter(
+        unmasked, answer_type == 'array', *filters
+    ).group_by(*bucket_columns, question_key, element.c.value)
+    for row in rows:
+        row_bucket = row[0] if bucket_columns else None
+        question_id, value, count = row[-3:]
+        question_type = question_types.get(question_id)
+        if question_type is not None and question_type != 'single' and _is_option_index(value):
+            counts[(row_bucket, METRIC_OPTION, question_id, int(value))] += count
+
+
+def raw_score_counts(filters, bucket=None):
+    """按提交匯總統計分數分布，返回 Counter{(時間桶, METRIC_SCORE, 分數, 是否有評分題回答): 人數}"""
+    bucket_columns = [bucket.label('bucket')] if bucket is not None else []
+    scored = db.case((SessionSummary.max_score > 0, 1), else_=0)
+    rows = db.session.query(
+        *bucket_columns, SessionSummary.score, scored, func.count()
+    ).filter(*filters).group_by(*bucket_columns, SessionSummary.score, scored)
+
+    counts = Counter()
+    for row in rows:
+        row_bucket = row[0] if bucket_columns else None
+        score, is_scored, count = row[-3:]
+        counts[(row_bucket, METRIC_SCORE, score, is_scored)] += count
+    return counts
+
+
+def rollup_counts(days, hours, metrics):
+    """加總完整時間桶內的匯總，返回 Counter{(metric, key1, key2): 計數}"""
+    conditions = [
+        db.and_(StatsRollup.granularity == DAY, *span_filters(StatsRollup.bucket_start, low, high))
+        for low, high in days
+    ] + [
+        db.and_(StatsRollup.granularity == HOUR, *span_filters(StatsRollup.bucket_start, low, high))
+        for low, high in hours
+    ]
+    if not conditions:
+        return Counter()
+
+    rows = db.session.query(
+        StatsRollup.metric, StatsRollup.key1, StatsRollup.key2, func.sum(StatsRollup.value)
+    ).filter(
+        db.or_(*conditions), StatsRollup.metric.in_(metrics)
+    ).group_by(StatsRollup.metric, StatsRollup.key1, StatsRollup.key2)
+    return Counter({(metric, key1, key2): value for metric, key1, key2, value in rows})
+
+
+def range_counts(start, end, metrics):
+    """日期範圍內的指標計數：時間桶加總，再加上首尾原始數據"""
+    days, hours, raw = plan_range(start, end)
+    counts = rollup_counts(days, hours, metrics)
+    for low, high, high_inclusive in raw:
+        raw_counts = Counter()
+        if METRIC_SCORE in metrics:
+            raw_counts.update(raw_score_counts(span_filters(SessionSummary.created_at, low, high, high_inclusive)))
+        if any(metric in QUESTION_METRICS for metric in metrics):
+            raw_counts.update(raw_question_counts(span_filters(Response.created_at, low, high, high_inclusive)))
+        for (_, metric, key1, key2), value in raw_counts.items():
+            if metric in metrics:
+                counts[(metric, key1, key2)] += value
+    return counts
+
+
+def approx_range_counts(start, end, metrics):
+    """
+    只讀日桶的近似計數，返回 {(metric, key1, key2): (估計值, 下界, 上界)}
+    完全落在範圍內的日計入下界；與範圍部分相交的首尾兩日計入上界，並按時間重疊比例計入估計值
+    查詢的匯總行數只取決於日數，不掃描任何原始數據
+    """
+    inner_low = _ceil(start, floor_day, DAY_DELTA) if start else None
+    # end 包含在範圍內，結束於 end 之後的日不完整
+    inner_high = floor_day(end + timedelta(microseconds=1)) if end else None
+
+    edge_days = []
+    if start and start < inner_low:
+        edge_days.append(floor_day(start))
+    if end and inner_high <= end and inner_high not in edge_days:
+        edge_days.append(inner_high)
+
+    inner = []
+    if inner_low is None or inner_high is None or inner_low < inner_high:
+        inner.append((inner_low, inner_high))
+    lower = rollup_counts(inner, [], metrics)
+
+    estimates = {key: (value, value, value) for key, value in lower.items()}
+    for day in edge_days:
+        overlap_low = max(start, day) if start else day
+        overlap_high = min(end, day + DAY_DELTA) if end else day + DAY_DELTA
+        fraction = max((overlap_high - overlap_low) / DAY_DELTA, 0)
+        for key, value in rollup_counts([(day, day + DAY_DELTA)], [], metrics).items():
+            estimate, low, high = estimates.get(key, (0, 0, 0))
+            estimates[key] = (estimate + value * fraction, low, high + value)
+    return estimates
+
+
+class QuestionAggregates:
+    """
+    日期範圍內的每題統計
+    totals: {題目ID: (回答總數, 答對數)}
+    option_counts: {題目ID: {選項索引: 選擇人數}}（單選題比較答案值，其他題型檢查列表成員）
+
+    近似模式下各數值為估計值，bounds 為 {(metric, key1, key2): (下界, 上界)}，
+    人數的上下界為 total_responses_bounds；精確模式下兩者均為None
+    """
+
+    def __init__(self, total_responses, totals, option_counts, bounds=None, total_responses_bounds=None):
+        self.total_responses = total_responses
+        self.totals = totals
+        self.option_counts = option_counts
+        self.bounds = bounds
+        self.total_responses_bounds = total_responses_bounds
+
+    def option_count(self, question_id, option_index):
+        return self.option_counts.get(question_id, {}).get(option_index, 0)
+
+    def metric_bounds(self, metric, question_id, option_index=0):
+        return self.bounds.get((metric, question_id, option_index), (0, 0))
+
+
+def aggregate_question_stats(start=None, end=None, approx=False):
+    """
+    日期範圍內的人數、每題回答數、答對數及選項計數
+    approx時只讀日桶，返回估計值及上下界
+    """
+    bounds = total_responses_bounds = None
+    if approx:
+        estimates = approx_range_counts(start, end, QUESTION_METRICS)
+        counts = {key: round(estimate) for key, (estimate, _, _) in estimates.items()}
+        bounds = {key: (lower, upper) for key, (_, lower, upper) in estimates.items()}
+        sessions = approx_session_score_counts(start, end, scored_only=False).values()
+        total_responses = round(sum(estimate for estimate, _, _ in sessions))
+        total_responses_bounds = (sum(lower for _, lower, _ in sessions), sum(upper for _, _, upper in sessions))
+    else:
+        counts = range_counts(start, end, QUESTION_METRICS)
+        total_responses = count_sessions(start, end)
+
+    totals = {}
+    option_counts = {}
+    for (metric, question_id, option_index), value in counts.items():
+        if metric == METRIC_OPTION:
+            option_counts.setdefault(question_id, {})[option_index] = value
+        else:
+            total, correct = totals.get(question_id, (0, 0))
+            totals[question_id] = (total + value, correct) if metric == METRIC_ANSWERS else (total, correct + value)
+    return QuestionAggregates(total_responses, totals, option_counts, bounds, total_responses_bounds)
+
+
+def session_score_counts(start=None, end=None, scored_only=True):
+    """
+    日期範圍內（按提交時間）的分數分布 {分數: 人數}
+    scored_only時只統計有評分題回答的用戶
+    """
+    score_counts = Counter()
+    for (_, score, is_scored), count in range_counts(start, end, (METRIC_SCORE,)).items():
+        if count and (is_scored or not scored_only):
+            score_counts[score] += count
+    return dict(score_counts)
+
+
+def count_sessions(start=None, end=None):
+    """日期範圍內的提交人數（按提交時間）"""
+    return sum(session_score_counts(start, end, scored_only=False).values())
+
+
+def approx_session_score_counts(start=None, end=None, scored_only=True):
+    """只讀日桶的近似分數分布 {分數: (估計值, 下界, 上界)}"""
+    score_counts = {}
+    for (_, score, is_scored), (estimate, lower, upper) in approx_range_counts(start, end, (METRIC_SCORE,)).items():
+        if is_scored or not scored_only:
+            total_estimate, total_lower, total_upper = score_counts.get(score, (0, 0, 0))
+            score_counts[score] = (total_estimate + estimate, total_lower + lower, total_upper + upper)
+    return score_counts
@@ -0,0 +1,35 @@
+import threading
+
+from .cache import SingleFlightCache
+
+# 統計端點的結果按（數據版本、端點、參數）緩存；提交、清除數據及題目變更commit後遞增數據版本，
+# 舊版本的結果不會再被命中，並發的相同請求共用一次計算
+# 數據版本只在本進程內遞增，依賴單進程部署（啟動時由 process_guard 檢查）
+_results = SingleFlightCache(max_entries=64)
+_version_lock = threading.Lock()
+_data_version = 0
+
+
+def cached_stats(endpoint, params, compute):
+    """
+    返回緩存的統計結果，未命中時調用compute()計算
+    鍵在計算前取得數據版本：計算期間若有新數據commit，結果以舊版本寫入而不會再被命中
+    """
+    key = (_data_version, endpoint, params)
+    return _results.get_or_compute(key, compute)
+
+
+def bump_data_version():
+    """統計數據變更並commit後調用"""
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+        _results.clear()
+
+
+def current_data_version():
+    return _data_version
+
+
+def stats_cache_stats():
+    return {'data_version': _data_version, **_results.stats()}
@@ -0,0 +1,112 @@
+from collections import Counter
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..models.quiz import QuestionCounter, OptionCounter, StatsCounter, Response, db
+from .answer_masks import selected_options
+from .question_bank import get_question_bank
+
+SESSIONS_COUNTER = 'sessions'  # 總回應人數
+
+
+def upsert_increments(model, key_columns, rows, value_columns):
+    """按主鍵累加計數（SQLite UPSERT）"""
+    if not rows:
+        return
+    table = model.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={column: table.c[column] + stmt.excluded[column] for column in value_columns}
+    )
+    db.session.execute(stmt, rows)
+
+
+def apply_responses(rows, sign=1):
+    """
+    在目前的交易中按回應增減每題及每個選項的計數
+    rows: 可迭代的 (question_id, answer, is_correct)
+    """
+    question_bank = get_question_bank()
+    totals = Counter()
+    corrects = Counter()
+    options = Counter()
+
+    for question_id, answer, is_correct in rows:
+        totals[question_id] += 1
+        if is_correct:
+            corrects[question_id] += 1
+        question = question_bank.get(question_id)
+        if question:
+            for option_index in selected_options(question.question_type, answer):
+                options[(question_id, option_index)] += 1
+
+    upsert_increments(QuestionCounter, ['question_id'], [{
+        'question_id': question_id,
+        'total_answers': sign * total,
+        'correct_answers': sign * corrects[question_id]
+    } for question_id, total in totals.items()], ['total_answers', 'correct_answers'])
+
+    upsert_increments(OptionCounter, ['question_id', 'option_index'], [{
+        'question_id': question_id,
+        'option_index': option_index,
+        'count': sign * count
+    } for (question_id, option_index), count in options.items()], ['count'])
+
+
+def apply_submissions(submissions):
+    """提交寫入時在同一交易中更新計數"""
+    apply_responses(
+        (question_id, answer, is_correct)
+        for submission in submissions
+        for question_id, answer, is_correct in submission['responses']
+    )
+    sessions = sum(1 for submission in submissions if submission['responses'])
+    upsert_increments(StatsCounter, ['name'], [{'name': SESSIONS_COUNTER, 'value': sessions}] if sessions else [], ['value'])
+
+
+def refresh_session_count():
+    """刪除回應後重新統計總回應人數"""
+    total = db.session.query(Response.session_id).distinct().count()
+    db.session.merge(StatsCounter(name=SESSIONS_COUNTER, value=total))
+
+
+def rebuild_counters(chunk_size=5000):
+    """按現有回應重建全部計數（不負責commit）"""
+    clear_counters()
+    query = db.session.query(Response.question_id, Response.answer, Response.is_correct).yield_per(chunk_size)
+    apply_responses(query)
+    refresh_session_count()
+
+
+def clear_counters():
+    """清除全部回應時調用"""
+    OptionCounter.query.delete()
+    QuestionCounter.query.delete()
+    db.session.merge(StatsCounter(name=SESSIONS_COUNTER, value=0))
+
+
+def delete_question_counters(question_id):
+    OptionCounter.query.filter_by(question_id=question_id).delete()
+    QuestionCounter.query.filter_by(question_id=question_id).delete()
+
+
+def ensure_counters():
+    """啟動時調用：計數表尚未初始化時按現有回應回填"""
+    if db.session.get(StatsCounter, SESSIONS_COUNTER) is None:
+        rebuild_counters()
+        db.session.commit()
+
+
+def read_counters():
+    """返回 (總回應人數, {題目ID: (回答總數, 答對數)}, {(題目ID, 選項索引): 選擇人數})"""
+    sessions = db.session.get(StatsCounter, SESSIONS_COUNTER)
+    questions = {
+        row.question_id: (row.total_answers, row.correct_answers)
+        for row in db.session.query(QuestionCounter.question_id, QuestionCounter.total_answers, QuestionCounter.correct_answers)
+    }
+    options = {
+        (row.question_id, row.option_index): row.count
+        for row in db.session.query(OptionCounter.question_id, OptionCounter.option_index, OptionCounter.count)
+    }
+    return (sessions.value if sessions else 0), questions, options
@@ -0,0 +1,156 @@
+"""
+即時統計的Server-Sent Events推送
+提交commit後發佈增量事件（每題對錯及所選選項、新提交的分數），事件保存在有界環形緩衝中；
+客戶端以 Last-Event-ID 或 cursor 參數續傳，游標已過期或來自上一次啟動時改為發送完整快照
+事件只保存在進程內存中，與寫後日誌一樣要求單進程部署
+"""
+
+import json
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from ..models.quiz import db
+from .answer_masks import selected_options
+from .question_bank import get_question_bank
+from .stats_counters import read_counters
+
+HEARTBEAT_INTERVAL = 15  # 秒，無事件時發送註釋行保持連接
+RING_CAPACITY = 1024  # 環形緩衝保存的事件數
+
+
+class StatsBroadcaster:
+    """進程內的事件環形緩衝，一次發佈由所有連接共享"""
+
+    def __init__(self, capacity=RING_CAPACITY):
+        # 每次啟動使用新的epoch，上一個進程發出的游標一律視為過期
+        self.epoch = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=capacity)  # (序號, 事件類型, 已序列化的數據)
+        self._seq = 0
+        self._condition = threading.Condition()
+        # commit與發佈、讀取快照與取得游標分別在同一把鎖內完成，快照與後續增量不會重疊或遺漏
+        self._commit_lock = threading.RLock()
+
+    @contextmanager
+    def publishing(self):
+        with self._commit_lock:
+            yield
+
+    def cursor(self, seq=None):
+        return f'{self.epoch}-{self._seq if seq is None else seq}'
+
+    def parse_cursor(self, cursor):
+        """返回游標對應的序號；格式不符或來自其他epoch時返回None"""
+        epoch, _, seq = (cursor or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, event, data):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, event, payload))
+            self._condition.notify_all()
+
+    def events_after(self, seq):
+        """返回序號大於seq的事件；所需事件已被環形緩衝淘汰時返回None"""
+        with self._condition:
+            if seq > self._seq:
+                return None
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if seq + 1 < oldest and seq < self._seq:
+                return None
+            return [item for item in self._events if item[0] > seq]
+
+    def wait(self, seq, timeout):
+        """阻塞至有序號大於seq的事件或超時"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > seq, timeout)
+
+
+stats_broadcaster = StatsBroadcaster()
+
+
+def publish_submissions(submissions):
+    """發佈一批已commit的提交（調用方需持有 publishing() 鎖）"""
+    question_bank = get_question_bank()
+    sessions = []
+    for submission in submissions:
+        if not submission['responses']:
+            continue
+        answers = []
+        for question_id, answer, is_correct in submission['responses']:
+            question = question_bank.get(question_id)
+            options = sorted(selected_options(question.question_type, answer)) if question else []
+            answers.append([question_id, is_correct, options])
+        sessions.append({'score': submission['score'], 'max_score': submission['max_score'], 'answers': answers})
+    if sessions:
+        stats_broadcaster.publish('submissions', {'sessions': sessions})
+
+
+def publish_reset():
+    """數據清除或題目變更後調用，連接中的客戶端隨後會收到新的快照"""
+    stats_broadcaster.publish('reset', {})
+
+
+def build_snapshot():
+    """完整的計數快照及對應游標"""
+    with stats_broadcaster.publishing():
+        cursor = stats_broadcaster.cursor()
+        total_responses, question_counters, option_counters = read_counters()
+        # 結束讀交易，長連接期間不佔用數據庫連接
+        db.session.close()
+
+    questions = []
+    for question in get_question_bank().questions:
+        total_answers, correct_answers = question_counters.get(question.id, (0, 0))
+        questions.append({
+            'id': question.id,
+            'order': question.order,
+            'content': question.content,
+            'question_type': question.question_type,
+            'options': list(question.options),
+            'total_answers': total_answers,
+            'correct_answers': correct_answers,
+            'option_counts': [option_counters.get((question.id, i), 0) for i in range(len(question.options))]
+        })
+    return cursor, {'total_responses': total_responses, 'questions': questions}
+
+
+def _format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(cursor=None, heartbeat=HEARTBEAT_INTERVAL):
+    """SSE事件生成器：可續傳時先補發遺漏的增量，否則先發送快照，之後持續推送"""
+    # 提示瀏覽器斷線後的重連間隔
+    yield 'retry: 3000\n\n'
+
+    seq = stats_broadcaster.parse_cursor(cursor)
+    while True:
+        events = stats_broadcaster.events_after(seq) if seq is not None else None
+        if events is None:
+            snapshot_cursor, snapshot = build_snapshot()
+            seq = stats_broadcaster.parse_cursor(snapshot_cursor)
+            yield _format_event('snapshot', json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')), snapshot_cursor)
+            continue
+
+        for event_seq, event, payload in events:
+            seq = event_seq
+            yield _format_event(event, payload, stats_broadcaster.cursor(event_seq))
+            if event == 'reset':
+                # 之後的增量以新快照為基礎
+                seq = None
+                break
+
+        if not events:
+            stats_broadcaster.wait(seq, heartbeat)
+            if stats_broadcaster.events_after(seq) == []:
+                yield ': heartbeat\n\n'
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from ..models.quiz import Response, SessionSummary, db
+from .answer_masks import answer_mask
+from .question_bank import get_question_bank
+from .rollups import apply_rollups
+from .session_summaries import summary_rows
+from .stats_cache import bump_data_version
+from .stats_counters import apply_submissions
+from .stats_stream import publish_submissions, stats_broadcaster
+
+
+def build_submission(session_id, result, level=None):
+    """將評分結果整理為一筆提交記錄，同一次提交的回應共用同一個時間戳"""
+    return {
+        'session_id': session_id,
+        'created_at': datetime.utcnow(),
+        'score': result.score,
+        'max_score': result.max_score,
+        'level': level,
+        'interests': result.interests,
+        'responses': result.responses
+    }
+
+
+def persist_submissions(submissions):
+    """
+    在目前的交易中寫入提交記錄（不負責commit）
+    回應以單條executemany批量插入（同時寫入按題型編碼的答案位掩碼），不經過ORM物件及identity map；提交匯總、統計計數及時間桶匯總在同一交易中寫入
+    """
+    question_types = {question.id: question.question_type for question in get_question_bank().questions}
+    rows = [{
+        'session_id': submission['session_id'],
+        'question_id': question_id,
+        'answer': answer,
+        'answer_mask': answer_mask(question_types[question_id], answer) if question_id in question_types else None,
+        'is_correct': is_correct,
+        'created_at': submission['created_at']
+    } for submission in submissions for question_id, answer, is_correct in submission['responses']]
+
+    if rows:
+        db.session.execute(Response.__table__.insert(), rows)
+        db.session.execute(SessionSummary.__table__.insert(), summary_rows(submissions))
+        apply_submissions(submissions)
+        apply_rollups(submissions)
+
+
+def commit_submissions(submissions):
+    """寫入並commit一批提交，commit後使統計結果緩存失效並向即時統計的訂閱者發佈增量"""
+    with stats_broadcaster.publishing():
+        persist_submissions(submissions)
+        db.session.commit()
+        bump_data_version()
+        publish_submissions(submissions)
@@ -92,6 +92,64 @@
             }
         }
         
+        // 將二進制回應保存為文件（文件名取自Content-Disposition）
+        async function downloadResponseFile(response, fallbackName) {
+            const disposition = response.headers.get('Content-Disposition') || '';
+            const encodedName = disposition.match(/filename\*=UTF-8''([^;]+)/);
+            const plainName = disposition.match(/filename="?([^";]+)"?/);
+            const filename = encodedName ? decodeURIComponent(encodedName[1]) : (plainName ? plainName[1] : fallbackName);
+            
+            const blob = await response.blob();
+            const url = URL.createObjectURL(blob);
+            const link = document.createElement('a');
+            link.href = url;
+            link.download = filename;
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            URL.revokeObjectURL(url);
+        }
+        
+        // 建立後台導出任務，輪詢狀態直至完成後下載文件；失敗時拋出含錯誤信息的Error
+        async function runExportJob(format, startDate, endDate, fallbackName) {
+            const response = await fetch('/api/admin/export/jobs', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    format: format,
+                    start_date: startDate || null,
+                    end_date: endDate || null
+                })
+            });
+            
+            let result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error);
+            }
+            
+            let job = result.job;
+            while (job.status === 'pending') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const statusResponse = await fetch(job.status_url);
+                result = await statusResponse.json();
+                if (!statusResponse.ok) {
+                    throw new Error(result.error);
+                }
+                job = result.job;
+            }
+            if (job.status !== 'done') {
+                throw new Error(job.error);
+            }
+            
+            const download = await fetch(job.download_url);
+            if (!download.ok) {
+                throw new Error((await download.json()).error);
+            }
+            await downloadResponseFile(download, fallbackName);
+        }
+        
         // 導出Excel
         async function exportExcel() {
             const startDate = document.getElementById('export-start-date').value;
@@ -102,34 +160,12 @@
             document.getElementById('excel-text').style.display = 'none';
             
             try {
-                const response = await fetch('/api/admin/export/excel', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        start_date: startDate || null,
-                        end_date: endDate || null
-                    })
-                });
-                
-                const result = await response.json();
-                if (result.success) {
-                    // 創建下載鏈接
-                    const link = document.createElement('a');
-                    link.href = 'data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,' + result.data;
-                    link.download = result.filename;
-                    document.body.appendChild(link);
-                    link.click();
-                    document.body.removeChild(link);
-                    
-                    alert('Excel文件導出成功！');
-                } else {
-                    alert('Excel導出失敗：' + result.error);
-                }
+                // 由後台任務生成，完成後以二進制附件下載
+                await runExportJob('excel', startDate, endDate, 'export.xlsx');
+                alert('Excel文件導出成功！');
             } catch (error) {
                 console.error('Excel導出失敗:', error);
-                alert('Excel導出失敗，請重試');
+                alert('Excel導出失敗：' + (error.message || '請重試'));
             } finally {
                 // 恢復按鈕狀態
                 document.getElementById('excel-loading').style.display = 'none';
@@ -147,34 +183,12 @@
             document.getElementById('ppt-text').style.display = 'none';
             
             try {
-                const response = await fetch('/api/admin/export/powerpoint', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        start_date: startDate || null,
-                        end_date: endDate || null
-                    })
-                });
-                
-                const result = await response.json();
-                if (result.success) {
-                    // 創建下載鏈接
-                    const link = document.createElement('a');
-                    link.href = 'data:application/vnd.openxmlformats-officedocument.presentationml.presentation;base64,' + result.data;
-                    link.download = result.filename;
-                    document.body.appendChild(link);
-                    link.click();
-                    document.body.removeChild(link);
-                    
-                    alert('PowerPoint文件導出成功！');
-                } else {
-                    alert('PowerPoint導出失敗：' + result.error);
-                }
+                // 由後台任務生成，完成後以二進制附件下載
+                await runExportJob('powerpoint', startDate, endDate, 'export.pptx');
+                alert('PowerPoint文件導出成功！');
             } catch (error) {
                 console.error('PowerPoint導出失敗:', error);
-                alert('PowerPoint導出失敗，請重試');
+                alert('PowerPoint導出失敗：' + (error.message || '請重試'));
             } finally {
                 // 恢復按鈕狀態
                 document.getElementById('ppt-loading').style.display = 'none';
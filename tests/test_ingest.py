@@ -0,0 +1,85 @@
+"""寫後提交模式：停止時正在重試的批次不會被之後的批次越過，重啟後可重放"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.models.quiz import Question, Response, db
+from src.services import ingest
+from src.services.ingest import SubmissionJournal, SubmissionWriter
+from src.services.question_bank import invalidate_question_bank
+
+
+def create_app(database_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Question(id=1, content='Q1', question_type='single', order=1, options=['A', 'B'], correct_answer=0))
+        db.session.commit()
+        invalidate_question_bank()
+    return app
+
+
+def make_submission(session_id):
+    return {
+        'session_id': session_id,
+        'created_at': datetime.utcnow(),
+        'score': 1,
+        'max_score': 1,
+        'level': None,
+        'interests': [],
+        'responses': [(1, 0, True)]
+    }
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超時'
+        time.sleep(0.01)
+
+
+def test_stop_during_retry_keeps_failed_batch_for_replay(tmp_path, monkeypatch):
+    app = create_app(tmp_path / 'app.db')
+    journal_path = str(tmp_path / 'submit_journal.log')
+
+    # 含有session "failing" 的批次一律寫入失敗
+    persist_and_commit = ingest._persist_and_commit
+
+    def failing_persist(submissions, skip_existing=False):
+        if any(submission['session_id'] == 'failing' for submission in submissions):
+            raise RuntimeError('database is locked')
+        persist_and_commit(submissions, skip_existing)
+
+    monkeypatch.setattr(ingest, '_persist_and_commit', failing_persist)
+
+    journal = SubmissionJournal(journal_path)
+    writer = SubmissionWriter(app, journal, flush_interval=0.05, max_retries=5, retry_backoff=1)
+    writer.start()
+    writer.submit(make_submission('failing'))
+    wait_for(lambda: writer.metrics()['errors'] >= 1)
+
+    # 重試等待期間到達的提交可以寫入，但不能讓檢查點越過失敗的批次
+    writer.submit(make_submission('later'))
+    writer.stop()
+    journal.close()
+    assert not writer._thread.is_alive()
+
+    monkeypatch.setattr(ingest, '_persist_and_commit', persist_and_commit)
+    journal = SubmissionJournal(journal_path)
+    assert [submission['session_id'] for _, submission in journal.pending()] == ['failing', 'later']
+
+    replayed = SubmissionWriter(app, journal).replay()
+    journal.close()
+    assert replayed == 2
+    with app.app_context():
+        session_ids = {row[0] for row in db.session.query(Response.session_id).distinct()}
+    assert session_ids == {'failing', 'later'}